@@ -0,0 +1,45 @@
+"""
+命令行批处理吞吐:同一批合成拣货单,分别用 1 / 2 / 4 / … 个进程跑 picklist.cli.run_batch
+
+每份文件 --pages 页、种子各不相同(不会被去重);PDF 与 bench_stages 共用临时目录里的缓存。
+最后一列是相对单进程的加速比,文件数远多于进程数时应接近进程数。
+
+    python -m bench.bench_cli [--files 32] [--pages 20] [--workers 1 2 4 8]
+"""
+
+import argparse
+import os
+import tempfile
+
+from bench.bench_stages import CACHE_DIR, cached_picklist
+from picklist.cli import run_batch
+from picklist.extract import available_cpus
+
+
+def main():
+    cpus = available_cpus()
+    ap = argparse.ArgumentParser(description="命令行批处理吞吐")
+    ap.add_argument("--files", type=int, default=32)
+    ap.add_argument("--pages", type=int, default=20)
+    ap.add_argument("--workers", type=int, nargs="+",
+                    default=[w for w in (1, 2, 4, 8, 16) if w <= cpus] + ([cpus] if cpus & (cpus - 1) else []))
+    args = ap.parse_args()
+
+    paths = []
+    for seed in range(args.files):
+        cached_picklist(args.pages, seed)
+        paths.append(os.path.join(CACHE_DIR, f"synth-v2-{args.pages}p-{seed}.pdf"))
+
+    print(f"{args.files} 份 × {args.pages} 页,{cpus} 核")
+    print(f"{'workers':>8} {'seconds':>8} {'files/s':>8} {'speedup':>8}")
+    base = None
+    with tempfile.TemporaryDirectory() as out:
+        for workers in args.workers:
+            report = run_batch(paths, out, workers=workers)
+            base = base or report.seconds
+            print(f"{workers:>8} {report.seconds:>8.2f} {args.files / report.seconds:>8.1f} "
+                  f"{base / report.seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+拣货路线基准:随机库位上比较按库位顺序 / S 形 / 最近邻 / 路线引擎(+2-opt)的步行距离和耗时
+
+库位在仓库布局(picklist/data/warehouse_layout.json)的所有货位里均匀抽取。
+
+    python -m bench.bench_route [--stops 20 100 300] [--seeds 5]
+"""
+
+import argparse
+import random
+import time
+
+from picklist.locations import decode_location
+from picklist.route import (
+    distance_matrix, get_layout, nearest_neighbour_order, serpentine_order, solve_route, tour_length,
+)
+
+
+def random_locations(layout, count: int, seed: int) -> list:
+    rnd = random.Random(seed)
+    zones = list(layout.zones)
+    locs = set()
+    while len(locs) < count:
+        zone = rnd.choice(zones)
+        z = layout.zones[zone]
+        locs.add(f"{zone}-{rnd.randint(1, z['aisles']):02d}-{rnd.randint(1, z['slots']):02d}")
+    return sorted(locs, key=decode_location)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="拣货路线步行距离与耗时")
+    ap.add_argument("--stops", type=int, nargs="+", default=[20, 100, 300])
+    ap.add_argument("--seeds", type=int, default=5)
+    args = ap.parse_args()
+
+    layout = get_layout()
+    print(f"{'stops':>6} {'lexical':>9} {'S-shape':>9} {'nearest':>9} {'route':>9} {'saving':>7} {'time':>8}")
+    for stops in args.stops:
+        sums = [0.0] * 5
+        for seed in range(args.seeds):
+            places = [layout.place(loc) for loc in random_locations(layout, stops, seed)]
+            d = distance_matrix(layout, places)
+            t0 = time.perf_counter()
+            order, _ = solve_route(layout, places)
+            elapsed = time.perf_counter() - t0
+            for k, dist in enumerate((
+                tour_length(d, range(1, len(places) + 1)),
+                tour_length(d, serpentine_order(layout, places)),
+                tour_length(d, nearest_neighbour_order(d)),
+                tour_length(d, [i + 1 for i in order]),
+                elapsed,
+            )):
+                sums[k] += dist / args.seeds
+        lexical, s_shape, nearest, route, elapsed = sums
+        print(f"{stops:>6} {lexical:>8.0f}m {s_shape:>8.0f}m {nearest:>8.0f}m {route:>8.0f}m "
+              f"{1 - route / lexical:>6.0%} {elapsed * 1000:>6.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+分阶段基准:打开 → 提取 → 规范化 → 孤立数字修复 → 匹配 → 透视
+
+在 10 / 100 / 1000 页的合成拣货单上分别计时(各阶段以上一阶段的完整输出为输入,
+串行提取),最后一列是旧版整篇多遍扫描的端到端耗时。生成的 PDF 缓存在临时目录,
+重复运行不必重新生成。
+
+    python -m bench.bench_stages [--pages 10 100 1000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import fitz
+
+from bench.synth_pdf import build_picklist
+from picklist import legacy
+from picklist.parser import LineItemScanner, Tally, iter_normalized, iter_repaired
+from picklist.skus import get_catalog
+from picklist.table import build_pivot
+
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "picklist-bench")
+STAGES = ("open", "extract", "normalize", "orphan fix", "match", "pivot")
+
+
+def cached_picklist(pages: int, seed: int = 0) -> bytes:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"synth-v2-{pages}p-{seed}.pdf")
+    if not os.path.exists(path):
+        raw, _ = build_picklist(pages=pages, seed=seed)
+        with open(path, "wb") as f:
+            f.write(raw)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def time_stages(raw: bytes) -> dict:
+    timings = {}
+
+    def stage(name, fn):
+        t0 = time.perf_counter()
+        out = fn()
+        timings[name] = time.perf_counter() - t0
+        return out
+
+    doc = stage("open", lambda: fitz.open(stream=raw, filetype="pdf"))
+    pages = stage("extract", lambda: [page.get_text("text") for page in doc])
+    doc.close()
+    normalized = stage("normalize", lambda: list(iter_normalized(pages)))
+    repaired = stage("orphan fix", lambda: list(iter_repaired(normalized)))
+
+    def match():
+        scanner, tally = LineItemScanner(), Tally()
+        for item in scanner.iter_items(repaired):
+            tally.add(item)
+        return tally.result(scanner.expected_total or 0)
+
+    result = stage("match", match)
+    stage("pivot", lambda: build_pivot(result.sku_counts, get_catalog()))
+    return timings
+
+
+def main():
+    ap = argparse.ArgumentParser(description="解析各阶段耗时")
+    ap.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    header = f"{'pages':>6} " + " ".join(f"{s:>11}" for s in STAGES) + f" {'total':>9} {'legacy':>9}"
+    print(header)
+    for pages in args.pages:
+        raw = cached_picklist(pages)
+        best = {}
+        for _ in range(args.repeat):
+            for name, t in time_stages(raw).items():
+                best[name] = min(best.get(name, t), t)
+        t0 = time.perf_counter()
+        legacy.parse_pdf(raw)
+        t_legacy = time.perf_counter() - t0
+        cells = " ".join(f"{best[s] * 1000:>9.1f}ms" for s in STAGES)
+        print(f"{pages:>6} {cells} {sum(best.values()) * 1000:>7.0f}ms {t_legacy * 1000:>7.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
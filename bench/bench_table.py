@@ -0,0 +1,162 @@
+"""
+拣货明细表构建基准:旧版逐行实现 vs picklist.table 整列实现
+
+输入为 5k+ 个不同的 SKU-尺码组合(外加无尺寸款),计时范围是透视 → 库位 →
+排序 → 标色(含 Styler 计算样式),并核对两者输出的表和颜色完全一致。
+5k 行以上的整列实现要在 TARGET_MS 以内(取 5 次里最快的一次),超出时退出码为 1。
+计时受机器负载影响大,判定前确认没有别的进程在占 CPU。
+
+    python -m bench.bench_table
+"""
+
+import random
+import re
+import sys
+import time
+
+import pandas as pd
+
+from picklist.locations import LocationIndex, decode_locations
+from picklist.skus import compile_catalog
+from picklist.table import build_pivot, sort_pivot, style_pick_table
+
+# 5k+ 个 SKU-尺码行时整列实现的目标耗时
+TARGET_MS = 100
+TARGET_MIN_ROWS = 5_000
+
+
+def synth(prefixes: int, seed: int = 0):
+    """prefixes 个款式 × S/M/L,约 5% 没有库位;外加若干无尺寸 SKU。"""
+    rnd = random.Random(seed)
+    codes = [f"N{chr(65 + i // 1000 % 26)}{'XFJ'[i % 3]}{i % 1000:03d}" for i in range(prefixes)]
+    catalog = compile_catalog({
+        "version": 1,
+        "products": {c: f"Style {i:05d}" for i, c in enumerate(codes)},
+        "new": rnd.sample(codes, prefixes // 20),
+        "sizeless": ["NF001", "NB001"],
+        "b_chain": {},
+    })
+    located = [c for c in codes if rnd.random() > 0.05]
+    locs = [f"{rnd.choice('AB')}-{rnd.randint(1, 60):02d}-{rnd.randint(1, 99):02d}" for _ in located]
+    index = LocationIndex(dict(zip(located, zip(locs, decode_locations(locs)))))
+
+    sku_counts = {f"{c}-{sz}": rnd.randint(1, 40) for c in codes for sz in "SML"}
+    sku_counts.update({"NF001": 12, "NB001": 3, "__CHOOSE_SETS__": 7})
+    sku_counts.update({f"NZZ{i:03d}": 1 for i in range(prefixes // 50)})
+    return sku_counts, catalog, index
+
+
+# ============================================================================
+# 旧版实现(重构前 app.py 的逻辑,仅把全局变量改成参数)
+# ============================================================================
+def location_sort_key(loc: str):
+    if not loc or loc == "未识别库位":
+        return (99, 99, 99)
+    m = re.match(r'^([AB])-(\d{2})-(\d{2})$', loc)
+    if not m:
+        return (98, 0, 0)
+    zone = 0 if m.group(1) == 'A' else 1
+    return (zone, int(m.group(2)), int(m.group(3)))
+
+
+def legacy_table(sku_counts, catalog, index, by_location=True):
+    updated_mapping, sku_to_location = catalog.names, index.locations
+    df = pd.DataFrame(list(sku_counts.items()), columns=["Seller SKU", "Qty"])
+    df["SKU Prefix"] = df["Seller SKU"].str.split("-").str[0]
+    df["Size"] = df["Seller SKU"].str.split("-").str[1]
+
+    def map_name(prefix):
+        if prefix == "__CHOOSE_SETS__":
+            return "Choose 2 Sets(混合套装)"
+        return updated_mapping.get(prefix, "❓未识别")
+    df["Product Name"] = df["SKU Prefix"].map(map_name)
+
+    df_sized = df[df["Size"].notna()].copy()
+    df_nosized = df[df["Size"].isna()].copy()
+    pivot = df_sized.pivot_table(
+        index=["SKU Prefix", "Product Name"], columns="Size", values="Qty", aggfunc="sum", fill_value=0
+    ).reset_index()
+    pivot = pivot[["Product Name", "SKU Prefix", "S", "M", "L"]]
+    pivot["Total"] = pivot["S"] + pivot["M"] + pivot["L"]
+    for _, row in df_nosized.iterrows():
+        new_row = {"SKU Prefix": row["SKU Prefix"], "Product Name": row["Product Name"],
+                   "S": 0, "M": 0, "L": 0, "Total": row["Qty"]}
+        pivot = pd.concat([pivot, pd.DataFrame([new_row])], ignore_index=True)
+
+    def map_location(prefix):
+        if prefix in catalog.sizeless or prefix == "__CHOOSE_SETS__":
+            return "无库位(特殊款)"
+        return sku_to_location.get(prefix, "未识别库位")
+    pivot["库位"] = pivot["SKU Prefix"].map(map_location)
+
+    pivot["_special"] = pivot["SKU Prefix"].isin(catalog.sizeless | {"__CHOOSE_SETS__"}).astype(int)
+    if by_location:
+        pivot["_loc_key"] = pivot["库位"].apply(location_sort_key)
+        pivot = pivot.sort_values(by=["_special", "_loc_key", "Product Name"]) \
+            .drop(columns=["_loc_key", "_special"]).reset_index(drop=True)
+    else:
+        pivot["_name_key"] = pivot["Product Name"].str.lower()
+        pivot = pivot.sort_values(by=["_special", "_name_key"]) \
+            .drop(columns=["_special", "_name_key"]).reset_index(drop=True)
+    pivot = pivot[["库位", "Product Name", "S", "M", "L", "Total"]]
+
+    prefix_lookup = catalog.prefix_by_name
+
+    def highlight_row(row):
+        loc, prefix = str(row["库位"]), prefix_lookup.get(str(row["Product Name"]), "")
+        if loc == "未识别库位":
+            return ['background-color: #fef5e7'] * len(row)
+        if loc == "无库位(特殊款)":
+            return ['background-color: #f5f0f5'] * len(row)
+        if prefix in catalog.new_prefixes:
+            return ['background-color: #fff0f5'] * len(row)
+        return [''] * len(row)
+
+    styled = pivot.style.apply(highlight_row, axis=1)
+    styled._compute()
+    return pivot, styled
+
+
+def vectorized_table(sku_counts, catalog, index, by_location=True):
+    pivot = build_pivot(sku_counts, catalog, index)
+    table, status = sort_pivot(pivot, catalog, index, by_location)
+    styled = style_pick_table(table, status)
+    styled._compute()
+    return table, styled
+
+
+def best_of(fn, *args, repeat=5):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main() -> int:
+    print(f"{'rows':>7} {'mode':>9} {'legacy':>10} {'vectorized':>11} {'speedup':>8}  < {TARGET_MS}ms")
+    slow = []
+    for prefixes in (1_000, 2_000, 5_000):
+        sku_counts, catalog, index = synth(prefixes)
+        for by_location in (True, False):
+            t_old, (old, old_styled) = best_of(legacy_table, sku_counts, catalog, index, by_location, repeat=2)
+            t_new, (new, new_styled) = best_of(vectorized_table, sku_counts, catalog, index, by_location)
+            pd.testing.assert_frame_equal(old, new, check_dtype=False)
+            assert old_styled.ctx == new_styled.ctx
+            mode = "location" if by_location else "name"
+            verdict = ""
+            if len(sku_counts) >= TARGET_MIN_ROWS:
+                verdict = "✓" if t_new * 1000 < TARGET_MS else "✗"
+                if verdict == "✗":
+                    slow.append(f"{len(sku_counts)} 行 / {mode}")
+            print(f"{len(sku_counts):>7} {mode:>9} {t_old*1000:>8.0f}ms {t_new*1000:>9.1f}ms {t_old/t_new:>7.1f}x  {verdict}")
+    if slow:
+        print(f"❌ 超过 {TARGET_MS}ms:{'、'.join(slow)}")
+        return 1
+    print(f"✅ {TARGET_MIN_ROWS} 行以上都在 {TARGET_MS}ms 以内")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
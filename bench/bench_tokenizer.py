@@ -0,0 +1,72 @@
+"""
+单遍分词 vs 旧版多遍扫描 基准
+
+只比较匹配阶段(输入为已规范化、已修复断行的整篇文本),并核对两者计数一致。
+
+    python -m bench.bench_tokenizer
+"""
+
+import random
+import time
+
+from picklist import legacy
+from picklist.parser import LineItemScanner, Tally
+
+PREFIXES = ["NOF003", "NPX014", "NDX001", "NHF001", "NPJ010", "NOX025", "NWX002", "NLJ002"]
+B_CHAIN = ["NVT001", "NSB001", "NOB001"]
+
+
+def synth_text(orders: int, seed: int = 0) -> str:
+    """模拟 TikTok 拣货单文本:商品名 / SKU / 数量 + 物流单号,夹杂 bundle、赠品和 B链。"""
+    rnd = random.Random(seed)
+    lines = [f"Item quantity: {orders}"]
+    for _ in range(orders):
+        qty = rnd.randint(1, 3)
+        tracking = str(rnd.randint(10**17, 10**18 - 1))
+        k = rnd.random()
+        if k < 0.6:
+            code = "".join(rnd.choice(PREFIXES) for _ in range(rnd.randint(1, 4)))
+            lines += ["Press On Nails Glossy Almond Set", f"{code}-{rnd.choice('SML')}"]
+        elif k < 0.7:
+            lines += ["Free Giveaway", "NF001"]
+        elif k < 0.75:
+            lines += ["Organizer Binder", "NB001"]
+        elif k < 0.9:
+            lines += ["Accessory", rnd.choice(B_CHAIN)]
+        else:
+            lines += ["Choose 2 Sets, 50 g, Choose Your Size"]
+        lines.append(f"{qty} {tracking}")
+    return "\n".join(lines)
+
+
+def single_pass(text_fixed: str):
+    scanner = LineItemScanner()
+    tally = Tally()
+    for item in scanner.iter_items([text_fixed]):
+        tally.add(item)
+    return tally.result(scanner.expected_total or 0)
+
+
+def best_of(fn, arg, repeat=5):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    print(f"{'orders':>8} {'chars':>10} {'multi-pass':>11} {'single-pass':>12} {'speedup':>8}")
+    for orders in (1_000, 10_000, 50_000):
+        text = legacy.fix_orphan_digit_before_size(legacy.normalize_text(synth_text(orders)))
+        t_multi, r_multi = best_of(legacy.match_multipass, text)
+        t_single, r_single = best_of(single_pass, text)
+        assert r_single.sku_counts == r_multi.sku_counts
+        assert r_single.b_chain_counts == r_multi.b_chain_counts
+        assert r_single.bundle_extra == r_multi.bundle_extra
+        print(f"{orders:>8} {len(text):>10} {t_multi*1000:>9.1f}ms {t_single*1000:>10.1f}ms {t_multi/t_single:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
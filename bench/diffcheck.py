@@ -0,0 +1,110 @@
+"""
+差分校验:新解析引擎 vs 旧版逻辑(或生成器真值),逐字段核对
+
+对一批合成拣货单(不同种子、页数和行项目混合比例)分别跑参照和待测引擎,
+比较 sku_counts / b_chain_counts / expected_total / bundle_extra / 赠品 / 美甲册 /
+Choose Sets 件数以及对账结果。任何一处不同即打印差异并以退出码 1 结束。
+
+    python -m bench.diffcheck                         # 文本引擎 vs 旧版逻辑
+    python -m bench.diffcheck --engine layout --against truth
+    python -m bench.diffcheck --engine mypkg.fast:parse_pdf --seeds 50
+
+文本引擎与旧版逻辑必须完全一致;版面引擎按表格列读取,本来就比旧版准
+(长 bundle 换行、Choose 块后的行),应该与生成器真值比对。
+pagesplit 一组的 SKU 断在页缝、中间隔着几百个空白字符,版面引擎按页读表不支持,跑版面引擎时跳过。
+irregular 一组的 bundle 含非常规格式的前缀(NF001 / NM001 / AUCTION),与旧版的差异是预期的:
+旧版不拆这种 bundle,NOF003NF001-M 记成一个未识别 SKU,NM001-M、NOF003AUCTION-L 整行漏掉
+(AUCTIONNOF003-L 只剩 NOF003-L);现在按对照表拆成各段,NF001 计入赠品件数。
+irregular 一组有 Choose 块和换行,文本引擎本来就与真值对不上,--against legacy 时跳过;
+irregular_flat 一组去掉 Choose 块和 SKU 换行(文本引擎和旧版在这种单子上都与真值一致),
+--against legacy 时改为与真值比对,文本引擎拆这种 bundle 的结果由这一组核对。
+"""
+
+import argparse
+import importlib
+import sys
+
+from bench.synth_pdf import build_picklist
+from picklist import legacy
+from picklist.layout import parse_pdf_layout
+from picklist.parser import parse_pdf
+
+ENGINES = {"text": parse_pdf, "layout": parse_pdf_layout}
+
+FIELDS = ("sku_counts", "b_chain_counts", "expected_total", "bundle_extra",
+          "mystery_units", "binder_units", "choose_sets_units", "reconciliation")
+
+# 行项目混合比例:默认 / 换行多 / bundle 多 / 特殊款多
+MIXES = {
+    "default": {},
+    "wrapped": {"wrap": 0.6},
+    "bundles": {"bundle_mix": (0.1, 0.3, 0.3, 0.3)},
+    "special": {"sizeless": 0.25, "choose": 0.2, "b_chain": 0.25},
+    "pagesplit": {"page_split": 0.5},
+    "irregular": {"irregular": 0.3},
+    "irregular_flat": {"irregular": 0.3, "choose": 0, "wrap": 0, "long_wrap": False,
+                       "bundle_mix": (0.4, 0.35, 0.25, 0)},
+}
+# 版面引擎不支持的混合(见 synth_pdf 的 page_split)
+LAYOUT_SKIP = {"pagesplit"}
+# 结果本来就与旧版不同的混合(见上):前者跳过,后者改为与真值比对
+LEGACY_SKIP = {"irregular"}
+LEGACY_TO_TRUTH = {"irregular_flat"}
+
+
+def load_engine(spec: str):
+    if spec in ENGINES:
+        return ENGINES[spec]
+    module, _, func = spec.partition(":")
+    return getattr(importlib.import_module(module), func or "parse_pdf")
+
+
+def diff(expected, got) -> list:
+    out = []
+    for f in FIELDS:
+        a, b = getattr(expected, f), getattr(got, f)
+        if a == b:
+            continue
+        if isinstance(a, dict):
+            keys = sorted(k for k in set(a) | set(b) if a.get(k) != b.get(k))
+            out.append(f"{f}: " + ", ".join(f"{k} {a.get(k)}→{b.get(k)}" for k in keys[:8]))
+        else:
+            out.append(f"{f}: {a}→{b}")
+    return out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="解析引擎差分校验")
+    ap.add_argument("--engine", default="text", help="text / layout / 模块:函数")
+    ap.add_argument("--against", choices=["legacy", "truth"], default="legacy")
+    ap.add_argument("--seeds", type=int, default=10)
+    ap.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20])
+    args = ap.parse_args(argv)
+
+    engine = load_engine(args.engine)
+    cases = failures = truth_cases = 0
+    for mix_name, mix in MIXES.items():
+        if engine is parse_pdf_layout and mix_name in LAYOUT_SKIP:
+            continue
+        if args.against == "legacy" and mix_name in LEGACY_SKIP:
+            continue
+        for pages in args.pages:
+            for seed in range(args.seeds):
+                raw, truth = build_picklist(pages=pages, seed=seed, **mix)
+                against = "truth" if mix_name in LEGACY_TO_TRUTH else args.against
+                expected = legacy.parse_pdf(raw) if against == "legacy" else truth
+                problems = diff(expected, engine(raw))
+                cases += 1
+                truth_cases += against != args.against
+                if problems:
+                    failures += 1
+                    print(f"✗ mix={mix_name} pages={pages} seed={seed}")
+                    for p in problems:
+                        print(f"    {p}")
+    note = f"(其中 {truth_cases} 组与真值比对)" if truth_cases else ""
+    print(f"{args.engine} vs {args.against}: {cases - failures}/{cases} 一致{note}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
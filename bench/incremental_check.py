@@ -0,0 +1,105 @@
+"""
+增量解析校验:按页缓存 + 页缝修正的结果必须与整份解析逐项一致
+
+1. 随机切页:把合成拣货单的全文随机切成长短不一的"页"(切口落在任意字符,
+   专门制造跨页的 SKU / 数量 / Choose 块),逐页解析再合并,与 parse_pages 比对
+2. 重新导出:同一批订单先导出 N 单,补单后导出 N + extra 单,再补单导出
+   N + 2 × extra 单,最后原样上传一次;每次都与 parse_pdf 比对,并打印耗时和复用页数
+
+任何一处不同即打印差异并以退出码 1 结束。
+
+    python -m bench.incremental_check [--seeds 5] [--trials 20] [--orders 9000] [--extra 400]
+"""
+
+import argparse
+import hashlib
+import random
+import sys
+import time
+
+import fitz
+
+from bench.diffcheck import MIXES, diff
+from bench.synth_pdf import build_picklist
+from picklist.incremental import PAGE_CACHE, parse_page_texts, parse_pdf_incremental
+from picklist.parser import parse_pages, parse_pdf
+
+# 多一组 Choose 块密集的,跨页的 Choose 块最容易出错
+SPLIT_MIXES = dict(MIXES, choosy={"choose": 0.6})
+
+
+def random_split(text: str, rnd: random.Random) -> list:
+    cuts, pos = [], 0
+    while True:
+        pos += rnd.randint(420, 3000)
+        if pos >= len(text):
+            break
+        cuts.append(pos)
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+
+def check_splits(seeds: int, trials: int) -> tuple:
+    cases = failures = fallbacks = 0
+    for mix_name, mix in SPLIT_MIXES.items():
+        for seed in range(seeds):
+            raw, _ = build_picklist(pages=3, seed=seed, **mix)
+            with fitz.open(stream=raw, filetype="pdf") as doc:
+                full = "".join(page.get_text("text") for page in doc)
+            rnd = random.Random(seed)
+            for trial in range(trials):
+                texts = random_split(full, rnd)
+                fingerprints = [hashlib.sha256(t.encode()).hexdigest() for t in texts]
+                got = parse_page_texts(texts, fingerprints)
+                problems = diff(parse_pages(texts), got)
+                cases += 1
+                fallbacks += got.perf["counts"].get("fallback", 0)
+                if problems:
+                    failures += 1
+                    print(f"✗ split mix={mix_name} seed={seed} trial={trial} pages={[len(t) for t in texts]}")
+                    for p in problems:
+                        print(f"    {p}")
+    print(f"随机切页: {cases - failures}/{cases} 一致(其中 {fallbacks} 次整份解析)")
+    return cases, failures
+
+
+def check_reexport(orders: int, extra: int) -> tuple:
+    PAGE_CACHE.clear()
+    first, _ = build_picklist(orders=orders, seed=1)
+    second, _ = build_picklist(orders=orders + extra, seed=1)
+    third, _ = build_picklist(orders=orders + 2 * extra, seed=1)
+    uploads = (("first", first), ("re-export", second), ("re-export", third), ("again", third))
+    failures = 0
+    print(f"{'upload':<10} {'pages':>6} {'reused':>7} {'incremental':>12} {'full':>8}")
+    for label, raw in uploads:
+        t0 = time.perf_counter()
+        got = parse_pdf_incremental(raw)
+        t1 = time.perf_counter()
+        expected = parse_pdf(raw)
+        t2 = time.perf_counter()
+        counts = got.perf["counts"]
+        print(f"{label:<10} {counts['pages']:>6} {counts['pages_reused']:>7} "
+              f"{(t1 - t0) * 1000:>10.0f}ms {(t2 - t1) * 1000:>6.0f}ms")
+        problems = diff(expected, got)
+        if problems:
+            failures += 1
+            print(f"✗ re-export {label}")
+            for p in problems:
+                print(f"    {p}")
+    return len(uploads), failures
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="增量解析差分校验")
+    ap.add_argument("--seeds", type=int, default=5)
+    ap.add_argument("--trials", type=int, default=20)
+    ap.add_argument("--orders", type=int, default=9000)
+    ap.add_argument("--extra", type=int, default=400)
+    args = ap.parse_args(argv)
+
+    _, split_failures = check_splits(args.seeds, args.trials)
+    _, export_failures = check_reexport(args.orders, args.extra)
+    return 1 if split_failures or export_failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+解析服务压测:并发上传合成拣货单,统计吞吐、状态码、延迟分位数和去重命中
+
+    python -m bench.loadgen --spawn --workers 2 --queue 4 --requests 200 --concurrency 16
+    python -m bench.loadgen --url http://127.0.0.1:8765 --distinct 50 --retry
+
+- --spawn:先在子进程里启动 picklist.service(随机空闲端口),压测完关掉
+- 上传 --distinct 份不同的 PDF(各 --pages 页),其余请求重复上传其中的某一份,用来观察去重
+- 429 默认只计数;给了 --retry 时按 Retry-After 等待后重试
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError, HTTPRequest
+
+from bench.bench_stages import cached_picklist
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_healthy(client, url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return json.loads((await client.fetch(f"{url}/health")).body)
+        except (OSError, HTTPClientError):
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def run(args, url: str) -> dict:
+    client = AsyncHTTPClient(max_clients=args.concurrency)
+    await wait_healthy(client, url)
+    pdfs = [cached_picklist(args.pages, seed) for seed in range(args.distinct)]
+    rnd = random.Random(0)
+    plan = [i if i < args.distinct else rnd.randrange(args.distinct) for i in range(args.requests)]
+    rnd.shuffle(plan)
+
+    statuses, latencies = Counter(), []
+    deduplicated = retries = 0
+    gate = asyncio.Semaphore(args.concurrency)
+
+    async def one(i: int):
+        nonlocal deduplicated, retries
+        async with gate:
+            t0 = time.perf_counter()
+            while True:
+                req = HTTPRequest(f"{url}/parse?name=synth-{plan[i]}.pdf", method="POST", body=pdfs[plan[i]],
+                                  headers={"Content-Type": "application/pdf"}, request_timeout=600)
+                resp = await client.fetch(req, raise_error=False)
+                if resp.code == 429 and args.retry:
+                    retries += 1
+                    await asyncio.sleep(float(resp.headers.get("Retry-After", 1)))
+                    continue
+                break
+            statuses[resp.code] += 1
+            if resp.code == 200:
+                latencies.append(time.perf_counter() - t0)
+                deduplicated += json.loads(resp.body).get("deduplicated", False)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - t0
+    health = json.loads((await client.fetch(f"{url}/health")).body)
+    client.close()
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else float("nan")
+
+    return {"elapsed": elapsed, "statuses": statuses, "p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99),
+            "deduplicated": deduplicated, "retries": retries, "health": health}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="解析服务压测")
+    ap.add_argument("--url", help="已启动的服务地址(不给时需要 --spawn)")
+    ap.add_argument("--spawn", action="store_true", help="自己启动一个服务")
+    ap.add_argument("--workers", type=int, default=2, help="--spawn 时服务的解析进程数")
+    ap.add_argument("--queue", type=int, default=4, help="--spawn 时服务的排队上限")
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--distinct", type=int, default=20)
+    ap.add_argument("--pages", type=int, default=5)
+    ap.add_argument("--retry", action="store_true", help="429 时按 Retry-After 重试")
+    args = ap.parse_args()
+    if not args.url and not args.spawn:
+        ap.error("需要 --url 或 --spawn")
+    args.distinct = min(args.distinct, args.requests)
+
+    server = None
+    url = args.url
+    if args.spawn:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen([sys.executable, "-m", "picklist.service", "--port", str(port),
+                                   "--workers", str(args.workers), "--queue", str(args.queue)],
+                                  stderr=subprocess.DEVNULL)   # 每个 429 一行访问日志,压测时不看
+    try:
+        out = asyncio.run(run(args, url))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    codes = " ".join(f"{code}×{n}" for code, n in sorted(out["statuses"].items()))
+    print(f"{args.requests} 个请求 · 并发 {args.concurrency} · {args.distinct} 份不同的 PDF × {args.pages} 页")
+    print(f"耗时 {out['elapsed']:.1f}s · {args.requests / out['elapsed']:.1f} req/s · {codes}"
+          + (f" · 重试 {out['retries']} 次" if args.retry else ""))
+    print(f"200 延迟 p50 {out['p50']:.0f}ms · p95 {out['p95']:.0f}ms · p99 {out['p99']:.0f}ms · "
+          f"去重命中 {out['deduplicated']}")
+    print(f"服务端:{out['health']}")
+
+
+if __name__ == "__main__":
+    main()
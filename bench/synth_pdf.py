@@ -0,0 +1,252 @@
+"""
+合成 TikTok 风格拣货单 PDF(PyMuPDF 生成,表格版式)
+
+每页一行表头(Product name / Seller SKU / Qty / Tracking number),首页顶部写
+"Item quantity: N"。行项目的混合比例可调:
+- 甲片 SKU / bundle(1~4 段,按 bundle_mix 的权重);按 irregular 的比例(默认不开)把其中一段
+  换成非常规格式的已知前缀(NF001 / NM001 / AUCTION),如 NOF003NF001-M、NM001-S
+- NF001 赠品、NB001 美甲册
+- Choose N Sets 混合套装(SKU 格为空)
+- B链产品(带物流单号)
+- 换行:一部分 SKU 断成 "NOF00" / "3-M" 两行(旧逻辑的孤立数字修复场景),
+  超过单元格宽度的长 bundle 在 12 个字符处换行(long_wrap=False 时不换,最多 3 段的 bundle
+  放得下一行);商品名也会占两行
+- 跨页(page_split,默认不开):页首一行单段 SKU 的 "NOF00" 留在上一页页底,后面跟着
+  几行空格(提取出几百个空白字符),"3-M"、数量和物流单号在下一页、先于表头写入。
+  文本模式的断行修复要跨过页缝和整段空白;版面模式按坐标分页读表,不支持这种行
+
+build_picklist() 返回 PDF 字节和按生成内容算出的真值 ParseResult。
+
+    python -m bench.synth_pdf out.pdf --pages 100 --seed 1
+"""
+
+import argparse
+import random
+import re
+from collections import defaultdict
+from typing import NamedTuple
+
+import fitz
+
+from picklist.parser import ParseResult
+from picklist.skus import get_catalog, is_regular_prefix
+
+COLUMN_X = {"product": 40, "sku": 250, "qty": 400, "tracking": 440}
+HEADERS = {"product": "Product name", "sku": "Seller SKU", "qty": "Qty", "tracking": "Tracking number"}
+FONT_SIZE = 9
+LINE_H = 11
+# 跨页行在上一页页底写的空格行:行数 × 每行空格数要超过 parser.REPAIR_TAIL
+SPLIT_PAD_LINES = 4
+SPLIT_PAD_SPACES = 90
+ROW_GAP = 8
+PAGE_TOP = 40
+PAGE_BOTTOM = 780
+# 单元格一行最多放这么多字符,更长的 bundle 换行
+SKU_CELL_CHARS = 14
+
+PRODUCT_NAMES = ["Press On Nails Almond", "Glossy Short Square Set", "French Tip Coffin", "Chrome Oval Set"]
+
+
+def _nail_prefixes():
+    catalog = get_catalog()
+    return sorted(p for p in catalog.names if re.fullmatch(r'[A-Z]{3}\d{3}', p) and p not in catalog.b_chain_codes)
+
+
+class Row(NamedTuple):
+    product: list       # 商品名(可能占两行)
+    sku_lines: list     # Seller SKU 格里的各行;Choose Sets 为空
+    qty: int
+    tracking: str
+    kind: str           # nail / NF001 / NB001 / b_chain / choose
+    codes: tuple = ()   # 甲片:bundle 拆开后的各段前缀
+    split: bool = False # SKU 格从上一页页底开始(见 page_split)
+
+
+def synth_rows(count: int, seed: int = 0, bundle_mix=(0.55, 0.25, 0.12, 0.08), sizeless=0.12,
+               choose=0.08, b_chain=0.12, wrap=0.1, irregular=0.0, long_wrap=True):
+    rnd = random.Random(seed)
+    prefixes = _nail_prefixes()
+    irregular_codes = sorted(get_catalog().prefixes.irregular)
+    b_chain_codes = sorted(get_catalog().b_chain_codes)
+    rows = []
+    for _ in range(count):
+        qty = rnd.randint(1, 3)
+        tracking = str(rnd.randint(10**17, 10**18 - 1))
+        product = [rnd.choice(PRODUCT_NAMES)] + (["Glossy Set 24 pcs"] if rnd.random() < 0.3 else [])
+        k = rnd.random()
+        if k < choose:
+            rows.append(Row([f"Choose {rnd.randint(2, 3)} Sets, 50 g, Choose Your Size"], [], qty, tracking, "choose"))
+        elif k < choose + sizeless:
+            code = rnd.choice(["NF001", "NF001", "NB001"])
+            rows.append(Row(product, [code], qty, tracking, code))
+        elif k < choose + sizeless + b_chain:
+            rows.append(Row(product, [rnd.choice(b_chain_codes)], qty, tracking, "b_chain"))
+        else:
+            parts = rnd.choices(range(1, 5), weights=bundle_mix)[0]
+            codes = tuple(rnd.choice(prefixes) for _ in range(parts))
+            # irregular 为 0 时不多取随机数,原有混合比例生成的 PDF 不变
+            if irregular and rnd.random() < irregular:
+                i = rnd.randrange(parts)
+                codes = codes[:i] + (rnd.choice(irregular_codes),) + codes[i + 1:]
+            sku = "".join(codes) + "-" + rnd.choice("SML")
+            if len(sku) > SKU_CELL_CHARS:
+                sku_lines = [sku[:12], sku[12:]] if long_wrap else [sku]
+            elif rnd.random() < wrap and sku[5].isdecimal():
+                # 只断 "NOF00" / "3-M" 这种下一行以数字开头的(旧逻辑的孤立数字修复场景)
+                sku_lines = [sku[:5], sku[5:]]
+            else:
+                sku_lines = [sku]
+            rows.append(Row(product, sku_lines, qty, tracking, "nail", codes))
+    return rows
+
+
+def truth_of(rows) -> ParseResult:
+    sku_counts, b_chain_counts = defaultdict(int), defaultdict(int)
+    expected = extra = mystery = binder = choose = 0
+    for r in rows:
+        expected += r.qty
+        if r.kind == "nail":
+            size = r.sku_lines[-1][-1]
+            for c in r.codes:
+                sku_counts[f"{c}-{size}"] += r.qty
+            extra += (len(r.codes) - 1) * r.qty
+            mystery += r.codes.count("NF001") * r.qty
+        elif r.kind == "b_chain":
+            b_chain_counts[r.sku_lines[0]] += r.qty
+        elif r.kind == "choose":
+            sku_counts["__CHOOSE_SETS__"] += r.qty
+            choose += r.qty
+        else:
+            sku_counts[r.kind] += r.qty
+            if r.kind == "NF001":
+                mystery += r.qty
+            else:
+                binder += r.qty
+    return ParseResult(
+        sku_counts=dict(sku_counts),
+        b_chain_counts=dict(b_chain_counts),
+        expected_total=expected,
+        bundle_extra=extra,
+        mystery_units=mystery,
+        binder_units=binder,
+        choose_sets_units=choose,
+    )
+
+
+def _row_height(row: Row) -> int:
+    return max(len(row.product), len(row.sku_lines), 1) * LINE_H
+
+
+def paginate(rows, max_pages: int = None) -> list:
+    """按版面把行分到各页;给了 max_pages 时多出的行丢掉。"""
+    pages, y = [], None
+    for row in rows:
+        h = _row_height(row)
+        if y is None or y + h > PAGE_BOTTOM:
+            if max_pages is not None and len(pages) == max_pages:
+                break
+            pages.append([])
+            y = PAGE_TOP + LINE_H + 5 + (20 if len(pages) == 1 else 0)
+        pages[-1].append(row)
+        y += h + ROW_GAP
+    return pages
+
+
+def split_rows(pages, rate: float, seed: int = 0) -> list:
+    """按 rate 的比例,把每页(首页除外)第一个单段、单行的甲片行挪到页首,标成跨页行。"""
+    rnd = random.Random(seed)
+    out = [list(rows) for rows in pages]
+    for rows in out[1:]:
+        i = next((i for i, r in enumerate(rows)
+                  if r.kind == "nail" and len(r.codes) == 1 and len(r.sku_lines) == 1
+                  and is_regular_prefix(r.codes[0])), None)
+        if i is not None and rnd.random() < rate:
+            rows.insert(0, rows.pop(i)._replace(split=True))
+    return out
+
+
+def render(pages, expected_total: int) -> bytes:
+    # 每页的文字一次写入(一条内容流),与后台导出的 PDF 一样;逐条 insert_text 会每行一条流
+    doc = fitz.open()
+    font = fitz.Font("helv")
+    for page_no, rows in enumerate(pages):
+        page = doc.new_page()
+        tw = fitz.TextWriter(page.rect)
+
+        def put(pos, text, size=FONT_SIZE):
+            tw.append(pos, text, font=font, fontsize=size)
+
+        y = PAGE_TOP + LINE_H + 5 + (20 if page_no == 0 else 0)
+        if rows and rows[0].split:
+            # 跨页行的后半段:先于表头写入,提取出的文字紧接在上一页的 "NOF00" 和空白后面
+            put((COLUMN_X["sku"], y), rows[0].sku_lines[0][5:])
+            put((COLUMN_X["qty"], y), str(rows[0].qty))
+            put((COLUMN_X["tracking"], y), rows[0].tracking)
+
+        y = PAGE_TOP
+        if page_no == 0:
+            put((COLUMN_X["product"], y), f"Item quantity: {expected_total}", FONT_SIZE + 1)
+            y += 20
+        for col, x in COLUMN_X.items():
+            put((x, y), HEADERS[col])
+        y += LINE_H + 5
+        for row in rows:
+            if row.split:
+                y += _row_height(row) + ROW_GAP
+                continue
+            for i, line in enumerate(row.product):
+                put((COLUMN_X["product"], y + i * LINE_H), line)
+            for i, line in enumerate(row.sku_lines):
+                put((COLUMN_X["sku"], y + i * LINE_H), line)
+            put((COLUMN_X["qty"], y), str(row.qty))
+            put((COLUMN_X["tracking"], y), row.tracking)
+            y += _row_height(row) + ROW_GAP
+        following = pages[page_no + 1] if page_no + 1 < len(pages) else []
+        if following and following[0].split:
+            # 跨页行的前半段:商品名和 "NOF00" 在页底,后面几行空格
+            row = following[0]
+            y = min(y, PAGE_BOTTOM)
+            for i, line in enumerate(row.product):
+                put((COLUMN_X["product"], y + i * LINE_H), line)
+            put((COLUMN_X["sku"], y), row.sku_lines[0][:5])
+            for i in range(SPLIT_PAD_LINES):
+                put((COLUMN_X["sku"], y + LINE_H + i * 3), " " * SPLIT_PAD_SPACES)
+        tw.write_text(page)
+    raw = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return raw
+
+
+def build_picklist(pages: int = None, orders: int = None, seed: int = 0, page_split: float = 0.0, **mix):
+    """
+    按页数或订单数生成拣货单 → (PDF 字节, 真值 ParseResult)。
+    给页数时生成足够多的行、填满 pages 页为止;page_split 为页首行跨页的比例。
+    """
+    if orders is None:
+        # 每页最多约 60 行,多生成一些再截断
+        rows = synth_rows((pages or 1) * 64, seed, **mix)
+    else:
+        rows = synth_rows(orders, seed, **mix)
+    laid_out = paginate(rows, pages)
+    if page_split:
+        laid_out = split_rows(laid_out, page_split, seed)
+    truth = truth_of(r for page in laid_out for r in page)
+    return render(laid_out, truth.expected_total), truth
+
+
+def main():
+    ap = argparse.ArgumentParser(description="生成合成拣货单 PDF")
+    ap.add_argument("out")
+    ap.add_argument("--pages", type=int)
+    ap.add_argument("--orders", type=int)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    raw, truth = build_picklist(args.pages, args.orders, args.seed)
+    with open(args.out, "wb") as f:
+        f.write(raw)
+    print(f"{args.out}: {len(raw) // 1024} KB, Item quantity {truth.expected_total}, "
+          f"实际件数 {truth.total_qty}(bundle 拆分 +{truth.bundle_extra})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""NailVesta 拣货单解析核心(不依赖 Streamlit,可被 app.py / 脚本复用)。"""
@@ -0,0 +1,186 @@
+"""
+分批拣货:按拣货车容量把一张拣货表切成若干趟,总步行距离尽量短
+
+- 拣货表的每个 (款式, 尺码) 是一个拣货行;一行件数超过单车容量时先拆成整车的几块
+- 按拣货表当前的行顺序(拣货路线 / 库位顺序)切成连续的几段,每段不超过件数和
+  格口容量;用动态规划在所有切法里取总距离最短的一种(每趟从出发点出发再回来,
+  段内按原顺序走;距离用 picklist.route 的距离矩阵)
+- 有多个拣货员时,单车容量不超过 总件数 / 人数,保证每人至少一趟、各趟件数接近;
+  各趟再按预计用时(步行 + 拣货)轮流分给当前最空闲的拣货员
+- 切好后每趟单独再排一次路线
+- 特殊款和没有库位的行不进拣货车,单独列出
+
+只用整列运算和一维 DP,滑块改容量时可以直接重算。
+"""
+
+import io
+import zipfile
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from picklist.route import WarehouseLayout, distance_matrix, solve_route, tour_length
+from picklist.table import MISSING_LOCATION, SIZES, SPECIAL_LOCATION
+
+# 预计用时:步行速度(米 / 分钟)和每件拣货秒数,只用于给拣货员分配
+WALK_PER_MIN = 50.0
+PICK_SECONDS = 6.0
+# 每趟重新排路线时 2-opt 的时间上限(秒)
+BATCH_ROUTE_BUDGET = 0.05
+
+BATCH_COLUMNS = ["库位", "Product Name", "Size", "Qty"]
+
+
+class Batch(NamedTuple):
+    number: int
+    picker: int
+    lines: pd.DataFrame     # 按路线顺序的拣货行:库位 / Product Name / Size / Qty
+    units: int
+    bins: int
+    distance: float
+    minutes: float
+
+
+class BatchPlan(NamedTuple):
+    batches: list
+    leftover: pd.DataFrame  # 特殊款、没有库位的行,不进拣货车
+    distance: float
+    unit: str
+
+
+def pick_lines(table: pd.DataFrame) -> tuple:
+    """拣货表 → (可上车的拣货行, 其余行),均为 库位 / Product Name / Size / Qty,保持表的行顺序。"""
+    long = table.melt(id_vars=["库位", "Product Name"], value_vars=SIZES, var_name="Size", value_name="Qty",
+                      ignore_index=False)
+    # melt 是按尺码分块的,按原行号 + 尺码顺序还原
+    long["_row"] = long.index
+    long["_size"] = long["Size"].map({s: i for i, s in enumerate(SIZES)})
+    long = long[long["Qty"] > 0].sort_values(["_row", "_size"], kind="stable")[BATCH_COLUMNS]
+
+    # 无尺寸款只有 Total
+    sizeless = table[table[SIZES].sum(axis=1) == 0]
+    sizeless = pd.DataFrame({"库位": sizeless["库位"], "Product Name": sizeless["Product Name"],
+                             "Size": "", "Qty": sizeless["Total"]})
+    lines = pd.concat([long, sizeless]).reset_index(drop=True)
+    off_cart = lines["库位"].isin([SPECIAL_LOCATION, MISSING_LOCATION])
+    return lines[~off_cart].reset_index(drop=True), lines[off_cart].reset_index(drop=True)
+
+
+def _chunk(lines: pd.DataFrame, max_units: int) -> pd.DataFrame:
+    """件数超过单车容量的行拆成整车的几块 + 余数。"""
+    if not max_units:
+        return lines
+    qty = lines["Qty"].to_numpy()
+    pieces = -(-qty // max_units)
+    out = lines.loc[lines.index.repeat(pieces)].reset_index(drop=True)
+    first = np.repeat(np.cumsum(pieces) - pieces, pieces)
+    k = np.arange(len(out)) - first
+    total = np.repeat(qty, pieces)
+    out["Qty"] = np.minimum(max_units, total - k * max_units)
+    return out
+
+
+def _split(costs_to_depot, path, units, max_units, max_bins):
+    """
+    连续切分 DP。best[i] = 前 i 行切完的最短总距离;段 (j, i] 的距离 =
+    出发点 → 段内第一个库位 + 沿原顺序走到最后一个 + 回到出发点。
+    path[i] = 从第 0 行沿原顺序走到第 i 行的累计距离(没有坐标的行不增加距离)。
+    """
+    n = len(units)
+    cum_units = np.concatenate([[0], np.cumsum(units)])
+    best = np.full(n + 1, np.inf)
+    best[0] = 0.0
+    prev = np.zeros(n + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        lo = i - max_bins if max_bins else 0
+        if max_units:
+            lo = max(lo, int(np.searchsorted(cum_units, cum_units[i] - max_units, side="left")))
+        lo = max(0, min(lo, i - 1))
+        j = np.arange(lo, i)
+        # 段 (j, i] 的第一行是 j,最后一行是 i - 1
+        cost = best[j] + costs_to_depot[j] + (path[i - 1] - path[j]) + costs_to_depot[i - 1]
+        k = int(cost.argmin())
+        best[i], prev[i] = cost[k], j[k]
+    cuts, i = [], n
+    while i > 0:
+        cuts.append((int(prev[i]), i))
+        i = prev[i]
+    return cuts[::-1]
+
+
+def plan_batches(table: pd.DataFrame, layout: WarehouseLayout, max_units: int = None, max_bins: int = None,
+                 pickers: int = 1) -> BatchPlan:
+    """
+    排好序的拣货表 → BatchPlan。max_units:单车件数上限;max_bins:单车格口数
+    (每个拣货行占一格);两者都不给时整张表一趟。
+    """
+    lines, leftover = pick_lines(table)
+    if pickers > 1 and len(lines):
+        per_picker = -(-int(lines["Qty"].sum()) // pickers)
+        max_units = min(max_units or per_picker, per_picker)
+    lines = _chunk(lines, max_units)
+    if lines.empty:
+        return BatchPlan([], leftover, 0.0, layout.unit)
+
+    locs = lines["库位"].unique()
+    place_of = {loc: layout.place(loc) for loc in locs}
+    routable = [loc for loc in locs if place_of[loc] is not None]
+    d = distance_matrix(layout, [place_of[loc] for loc in routable])
+    col = {loc: i + 1 for i, loc in enumerate(routable)}
+
+    # 没有坐标的库位沿用上一个有坐标的位置(距离不增加)
+    pos = lines["库位"].map(col).ffill().bfill().fillna(0).astype("int64").to_numpy()
+    costs_to_depot = d[0, pos]
+    path = np.concatenate([[0.0], np.cumsum(d[pos[:-1], pos[1:]])])
+
+    cuts = _split(costs_to_depot, path, lines["Qty"].to_numpy(), max_units, max_bins)
+
+    batches = []
+    for number, (start, end) in enumerate(cuts, start=1):
+        seg = lines.iloc[start:end]
+        seg_locs = [loc for loc in seg["库位"].unique() if place_of[loc] is not None]
+        if len(seg_locs) > 1:
+            order, sub = solve_route(layout, [place_of[loc] for loc in seg_locs], BATCH_ROUTE_BUDGET)
+            rank = {seg_locs[i]: r for r, i in enumerate(order)}
+            distance = tour_length(sub, [i + 1 for i in order])
+        else:
+            rank = {loc: 0 for loc in seg_locs}
+            distance = tour_length(d, [col[loc] for loc in seg_locs])
+        seg = seg.assign(_rank=seg["库位"].map(rank).fillna(len(rank))).sort_values("_rank", kind="stable")
+        units = int(seg["Qty"].sum())
+        minutes = distance / WALK_PER_MIN + units * PICK_SECONDS / 60
+        batches.append(Batch(number, 0, seg[BATCH_COLUMNS].reset_index(drop=True), units, len(seg),
+                             distance, minutes))
+
+    # 最长处理时间优先:用时长的先分,每趟给当前总用时最少的拣货员
+    load = [0.0] * max(1, pickers)
+    for b in sorted(batches, key=lambda b: -b.minutes):
+        p = load.index(min(load))
+        load[p] += b.minutes
+        batches[b.number - 1] = b._replace(picker=p + 1)
+    return BatchPlan(batches, leftover, sum(b.distance for b in batches), layout.unit)
+
+
+def batch_summary(plan: BatchPlan) -> pd.DataFrame:
+    return pd.DataFrame([
+        {"批次": b.number, "拣货员": b.picker, "件数": b.units, "格口": b.bins,
+         f"步行 {plan.unit}": round(b.distance), "预计分钟": round(b.minutes, 1),
+         "起点库位": b.lines["库位"].iat[0], "终点库位": b.lines["库位"].iat[-1]}
+        for b in plan.batches
+    ])
+
+
+def batch_csv(batch: Batch) -> bytes:
+    return batch.lines.to_csv(index=False).encode("utf-8-sig")
+
+
+def batches_zip(plan: BatchPlan) -> bytes:
+    """每趟一个 CSV(batch_01_picker_1.csv …),特殊款 / 无库位的行另存一个。"""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for b in plan.batches:
+            zf.writestr(f"batch_{b.number:02d}_picker_{b.picker}.csv", batch_csv(b))
+        if not plan.leftover.empty:
+            zf.writestr("not_batched.csv", plan.leftover.to_csv(index=False).encode("utf-8-sig"))
+    return buf.getvalue()
@@ -0,0 +1,121 @@
+"""
+进程级解析缓存
+
+Streamlit 每次交互(切换排序方式等)都会重跑 app.py。解析结果按 PDF 内容的
+sha256 缓存在进程内,所有会话共享:
+- LRU 淘汰,同时限制条目数和估算内存占用
+- single-flight:同一份 PDF 被多人同时上传时只解析一次,其余请求等待结果
+"""
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from picklist.layout import parse_pdf_layout
+from picklist.parser import ParseResult, parse_pdf
+
+# 解析模式:text = 按字符流匹配(默认);layout = 按单词坐标读表格列
+PARSERS = {"text": parse_pdf, "layout": parse_pdf_layout}
+
+
+def content_hash(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _approx_size(result: ParseResult) -> int:
+    size = sys.getsizeof(result)
+    for d in (result.sku_counts, result.b_chain_counts):
+        size += sys.getsizeof(d)
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in d.items())
+    return size
+
+
+class ParseCache:
+    def __init__(self, max_entries: int = 64, max_bytes: int = 32 * 1024 * 1024, sizeof=_approx_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()   # key -> (result, size)
+        self._inflight = {}             # key -> Future
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: str, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+                self.misses += 1
+
+        if not leader:
+            return fut.result()
+
+        try:
+            result = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            fut.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._inflight[key]
+            self._store(key, result)
+        fut.set_result(result)
+        return result
+
+    def get(self, key: str):
+        """只查不算,没有时返回 None(不参与 single-flight)。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, result):
+        with self._lock:
+            if key not in self._entries:
+                self._store(key, result)
+
+    def _store(self, key, result):
+        size = self.sizeof(result)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (result, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, old_size) = self._entries.popitem(last=False)
+            self._bytes -= old_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        """只看在不在,不算命中、不调整 LRU 顺序。"""
+        with self._lock:
+            return key in self._entries
+
+
+PARSE_CACHE = ParseCache()
+
+
+def parse_key(digest: str, mode: str, catalog) -> str:
+    # 键里带上对照表摘要:B链编码变了,同一份 PDF 的计数也会变
+    return f"{digest}:{mode}:{catalog.digest}"
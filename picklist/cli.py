@@ -0,0 +1,268 @@
+"""
+命令行批处理:不开浏览器,把一个目录(或通配符)下的拣货 PDF 一次处理完,给定时任务 / WMS 对接用
+
+    python -m picklist 拣货单/ --catalog 图册.csv --out 输出/
+    python -m picklist "exports/2024-*/*.pdf" --mode layout --workers 8
+
+- 每份 PDF 输出一个按库位(默认按拣货路线)排好的拣货明细 CSV,格式与页面上下载的相同
+- summary.csv:所有文件合并后的拣货明细;reconciliation.csv:每份文件一行的对账表
+- 内容相同的文件只处理一次(按内容哈希去重),在对账表里标出来;拣货历史里以相同模式、
+  相同对照表解析过的文件直接用存下的结果写 CSV,不再解析
+- 每份文件在进程池里整份处理(解析 → 透视 → 排序 → 写 CSV),子进程各自加载对照表、
+  图册和仓库布局,文件多时吞吐随核数近似线性增长
+- 有文件对账不一致或解析失败时退出码为 1,参数错误为 2,都正常为 0
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import NamedTuple
+
+import pandas as pd
+
+from picklist.cache import PARSERS
+from picklist.extract import available_cpus
+from picklist.history import HISTORY
+from picklist.locations import EMPTY_INDEX, LocationIndex, load_location_index
+from picklist.parser import ParseResult
+from picklist.perf import peak_rss_kb, write_perf_log
+from picklist.route import WarehouseLayout, get_layout, plan_route
+from picklist.skus import SkuCatalog, get_catalog
+from picklist.spool import hash_stream
+from picklist.table import SPECIAL_LOCATION, b_chain_summary, build_pivot, pick_table_csv, sort_pivot
+from picklist.wave import RECON_LABELS, WaveFile, failed_files, merge_results, wave_report
+
+SORTS = ("route", "location", "alpha")
+SUMMARY_CSV = "summary.csv"
+RECONCILIATION_CSV = "reconciliation.csv"
+NO_SKU_ERROR = "未识别到任何 SKU(扫描件?)"
+
+
+class BatchReport(NamedTuple):
+    entries: list           # [WaveFile],与输入顺序一致;name 为输入的路径
+    merged: ParseResult
+    outputs: dict           # 文件路径 → 写出的 CSV 路径
+    failed: list            # 对账不一致或解析失败的文件名
+    workers: int
+    seconds: float
+
+
+# ============================================================================
+# 单份文件:解析 → 拣货明细表
+# ============================================================================
+def pick_table(result: ParseResult, catalog: SkuCatalog, index: LocationIndex = EMPTY_INDEX,
+               layout: WarehouseLayout = None, sort: str = "route") -> pd.DataFrame:
+    """ParseResult → 排好序的拣货明细表(与页面上的表相同)。"""
+    pivot = build_pivot(result.sku_counts, catalog, index)
+    route = None
+    if sort == "route":
+        routed = pivot.loc[pivot["库位"] != SPECIAL_LOCATION, "SKU Prefix"]
+        route = plan_route(routed, index, layout or get_layout())
+    table, _ = sort_pivot(pivot, catalog, index, by_location=sort != "alpha", route=route)
+    return table
+
+
+def write_pick_csv(path: str, result: ParseResult, catalog: SkuCatalog, index: LocationIndex, sort: str):
+    table = pick_table(result, catalog, index, sort=sort)
+    with open(path, "wb") as f:
+        f.write(pick_table_csv(table, b_chain_summary(result.b_chain_counts, catalog)))
+
+
+def read_location_index(path: str) -> LocationIndex:
+    if not path:
+        return EMPTY_INDEX
+    with open(path, "rb") as f:
+        return load_location_index(f.read(), path)
+
+
+# 子进程里的图册,进程启动时加载一次
+_index = EMPTY_INDEX
+
+
+def _init_worker(catalog_path: str):
+    global _index
+    _index = read_location_index(catalog_path)
+
+
+def _process_file(pdf_path: str, csv_path: str, mode: str, sort: str) -> ParseResult:
+    catalog = get_catalog()
+    result = PARSERS[mode](pdf_path, workers=1, catalog=catalog)
+    if not result.sku_counts:
+        raise ValueError(NO_SKU_ERROR)
+    write_pick_csv(csv_path, result, catalog, _index, sort)
+    return result
+
+
+# ============================================================================
+# 批处理
+# ============================================================================
+def expand_inputs(patterns) -> list:
+    """目录 → 其下的 *.pdf;含通配符的按 glob 展开(支持 **);其余原样当文件。去重、保持顺序。"""
+    paths = []
+    for p in patterns:
+        if os.path.isdir(p):
+            paths += sorted(f for f in glob.glob(os.path.join(p, "*"))
+                            if f.lower().endswith(".pdf") and os.path.isfile(f))
+        elif glob.has_magic(p):
+            paths += sorted(f for f in glob.glob(p, recursive=True) if os.path.isfile(f))
+        else:
+            paths.append(p)
+    return list(dict.fromkeys(paths))
+
+
+def _csv_names(paths, digests) -> dict:
+    """每份 PDF 的输出文件名:同名的(不同目录)和与汇总文件重名的加上内容哈希前 8 位。"""
+    stems = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+    taken = {os.path.splitext(SUMMARY_CSV)[0], os.path.splitext(RECONCILIATION_CSV)[0]}
+    names = {}
+    for path, stem, digest in zip(paths, stems, digests):
+        if stems.count(stem) > 1 or stem in taken:
+            stem = f"{stem}-{digest[:8]}"
+        names[path] = stem + ".csv"
+    return names
+
+
+def run_batch(paths, out_dir: str, catalog_path: str = None, mode: str = "text", sort: str = "route",
+              workers: int = None, history=None, progress=None) -> BatchReport:
+    """
+    处理一批 PDF,写出每份文件的 CSV、summary.csv 和 reconciliation.csv → BatchReport。
+    history 给了时(picklist.history.HistoryStore)先查历史,解析过的不再解析,新解析的存进去;
+    progress(WaveFile) 在每份文件处理完时调用。
+    """
+    t0 = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    catalog = get_catalog()
+    index = read_location_index(catalog_path)
+
+    digests, first_path = [], {}
+    for path in paths:
+        with open(path, "rb") as f:
+            digests.append(hash_stream(f))
+    digest_of = dict(zip(paths, digests))
+    names = _csv_names(paths, digests)
+    unique = []
+    for path, digest in zip(paths, digests):
+        if digest not in first_path:
+            first_path[digest] = path
+            unique.append(path)
+
+    outcomes, jobs = {}, []
+    for path in unique:
+        csv_path = os.path.join(out_dir, names[path])
+        stored = history.lookup(digest_of[path], mode, catalog.digest) if history is not None else None
+        if stored is None:
+            jobs.append((path, csv_path, mode, sort))
+            continue
+        write_pick_csv(csv_path, stored, catalog, index, sort)
+        outcomes[path] = (stored, "")
+        if progress:
+            progress(WaveFile(path, digest_of[path], stored, ""))
+
+    if workers is None:
+        workers = min(len(jobs), available_cpus())
+
+    def done(path, result, error):
+        outcomes[path] = (result, error)
+        if history is not None and result is not None:
+            history.save(digest_of[path], os.path.basename(path), mode, catalog, result)
+        if progress:
+            progress(WaveFile(path, digest_of[path], result, error))
+
+    if jobs and workers > 1:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                                 initargs=(catalog_path,)) as pool:
+            futures = {job[0]: pool.submit(_process_file, *job) for job in jobs}
+            for path, fut in futures.items():
+                try:
+                    done(path, fut.result(), "")
+                except Exception as e:
+                    done(path, None, f"{type(e).__name__}: {e}")
+    elif jobs:
+        _init_worker(catalog_path)
+        for job in jobs:
+            try:
+                done(job[0], _process_file(*job), "")
+            except Exception as e:
+                done(job[0], None, f"{type(e).__name__}: {e}")
+
+    entries, outputs = [], {}
+    for path, digest in zip(paths, digests):
+        if first_path[digest] != path:
+            entries.append(WaveFile(path, digest, duplicate_of=first_path[digest]))
+            continue
+        result, error = outcomes[path]
+        entries.append(WaveFile(path, digest, result, error))
+        if result is not None:
+            outputs[path] = os.path.join(out_dir, names[path])
+
+    merged = merge_results(e.result for e in entries if e.result is not None)
+    if merged.sku_counts:
+        write_pick_csv(os.path.join(out_dir, SUMMARY_CSV), merged, catalog, index, sort)
+    report = wave_report(entries)
+    report.insert(1, "CSV", [os.path.basename(outputs.get(p, "")) for p in paths])
+    report.to_csv(os.path.join(out_dir, RECONCILIATION_CSV), index=False, encoding="utf-8-sig")
+    return BatchReport(entries, merged, outputs, failed_files(entries), workers,
+                       time.perf_counter() - t0)
+
+
+# ============================================================================
+# 命令行入口
+# ============================================================================
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m picklist", description="批量解析拣货 PDF,输出按库位排序的拣货明细 CSV")
+    ap.add_argument("inputs", nargs="+", help="PDF 文件、目录或通配符(如 'exports/**/*.pdf',记得加引号)")
+    ap.add_argument("--catalog", help="产品图册 CSV / Parquet(含 SKU / 库位 两列),不给时不按库位排序")
+    ap.add_argument("--out", default="picklist_out", help="输出目录(默认 ./picklist_out)")
+    ap.add_argument("--mode", choices=sorted(PARSERS), default="text", help="解析模式(默认 text)")
+    ap.add_argument("--sort", choices=SORTS, default="route",
+                    help="route:拣货路线(默认);location:库位顺序;alpha:产品名 A-Z")
+    ap.add_argument("--workers", type=int, help="进程数(默认 CPU 核数)")
+    ap.add_argument("--no-history", action="store_true", help="不写入拣货历史")
+    args = ap.parse_args(argv)
+
+    paths = expand_inputs(args.inputs)
+    missing = [p for p in paths if not os.path.isfile(p)]
+    if missing:
+        ap.error(f"找不到文件:{', '.join(missing)}")
+    if not paths:
+        ap.error("没有找到 PDF")
+    try:
+        read_location_index(args.catalog)
+    except (OSError, ValueError) as e:
+        ap.error(f"读取图册失败:{e}")
+
+    def progress(entry: WaveFile):
+        status = f"💥 {entry.error}" if entry.error else RECON_LABELS[entry.result.reconciliation]
+        print(f"{entry.name}: {status}", flush=True)
+
+    history = None if args.no_history else HISTORY
+    report = run_batch(paths, args.out, args.catalog, args.mode, args.sort, args.workers, history, progress)
+    if history is not None and history.error:
+        print(f"⚠️ {history.error}", file=sys.stderr)
+
+    merged = report.merged
+    print(f"\n{len(paths)} 份文件 · {len(report.outputs)} 份已输出 · 合计 {merged.total_qty} 件"
+          f"(PDF 标注 {merged.expected_total} + bundle 拆分 {merged.bundle_extra})"
+          f" · {report.seconds:.1f}s → {args.out}")
+    write_perf_log({
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "source": "cli",
+        "mode": args.mode,
+        "files": len(paths),
+        "workers": report.workers,
+        "seconds": round(report.seconds, 3),
+        "expected_total": merged.expected_total,
+        "total_qty": merged.total_qty,
+        "failed": report.failed,
+        "peak_rss_kb": peak_rss_kb(),
+    })
+    if report.failed:
+        print(f"❌ {len(report.failed)} 份文件对账不一致或解析失败:{'、'.join(report.failed)}", file=sys.stderr)
+        return 1
+    return 0
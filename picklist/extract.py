@@ -0,0 +1,207 @@
+"""
+PDF 逐页文本提取(大文件多进程并行)
+
+PyMuPDF 的文档对象不能跨线程共享,但每个子进程可以各自打开同一个文件、
+提取一段页码区间。页数达到 PARALLEL_MIN_PAGES 且机器有多核时,按页码区间
+分给进程池并按页序拼回;小 PDF 直接串行,不付进程池的启动开销。
+
+PDF 可以是字节,也可以是文件路径(上传先落盘,见 picklist.spool):按路径打开时
+MuPDF 按需读取,子进程直接打开同一个文件,不再另写临时文件。
+"""
+
+import atexit
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Union
+
+import fitz
+
+# PDF 字节或文件路径
+PdfSource = Union[bytes, str, os.PathLike]
+
+# 少于这个页数走串行
+PARALLEL_MIN_PAGES = 64
+# 每个任务至少这么多页,避免每个进程反复打开文档的开销压过提取本身
+MIN_PAGES_PER_TASK = 16
+MAX_WORKERS = 8
+# 每个进程最多排这么多个区间任务;结果按页序取走后再提交下一个,内存不随页数增长
+TASKS_IN_FLIGHT_PER_WORKER = 2
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def auto_workers(page_count: int) -> int:
+    if page_count < PARALLEL_MIN_PAGES:
+        return 1
+    return max(1, min(available_cpus(), MAX_WORKERS, page_count // MIN_PAGES_PER_TASK))
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    进程内共享的进程池(min(CPU 数, MAX_WORKERS) 个进程),第一次用时创建,进程退出时才关。
+    多个会话线程会同时往里提交任务,所以创建后不再按 workers 换池;
+    workers 只决定任务怎么切分。用 spawn 而不是 fork,Streamlit 服务端是多线程的。
+    """
+    global _pool
+    with _pool_lock:
+        # 子进程被杀(内存不足等)后池子不能再用,换一个;坏掉的池已经接不了新任务,换掉不影响别的线程
+        if _pool is None or getattr(_pool, "_broken", False):
+            _pool = ProcessPoolExecutor(max_workers=min(available_cpus(), MAX_WORKERS),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+@atexit.register
+def _shutdown_pool():
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+
+
+def is_path(source: PdfSource) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+
+def open_pdf(source: PdfSource):
+    if is_path(source):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def source_size(source: PdfSource) -> int:
+    return os.path.getsize(source) if is_path(source) else len(source)
+
+
+@contextmanager
+def pdf_path(source: PdfSource):
+    """子进程按路径打开文件,避免把整份 PDF 字节逐任务序列化;字节先写进临时文件。"""
+    if is_path(source):
+        yield os.fspath(source)
+        return
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+        yield path
+    finally:
+        os.unlink(path)
+
+
+def _extract_range(path: str, start: int, stop: int, option: str = "text") -> list:
+    doc = fitz.open(path)
+    try:
+        return [doc[i].get_text(option) for i in range(start, stop)]
+    finally:
+        doc.close()
+
+
+def _page_ranges(page_count: int, workers: int):
+    # 任务数取进程数的几倍,页数不均匀时负载更平衡
+    step = max(MIN_PAGES_PER_TASK, -(-page_count // (workers * 4)))
+    return [(i, min(i + step, page_count)) for i in range(0, page_count, step)]
+
+
+def iter_pages_serial(doc, option: str = "text"):
+    for page in doc:
+        yield page.get_text(option)
+
+
+def _map_ranges(path: str, ranges, workers: int, option: str = "text"):
+    """按顺序产出各页码区间的提取结果。不像 Executor.map 一次提交全部,同时在跑 / 待取的任务有上限。"""
+    pool = get_pool()
+    pending = deque()
+    try:
+        for start, stop in ranges:
+            pending.append(pool.submit(_extract_range, path, start, stop, option))
+            if len(pending) >= workers * TASKS_IN_FLIGHT_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # 调用方提前停下(如增量解析退回整份解析)时,还没开始的任务不再跑
+        for fut in pending:
+            fut.cancel()
+
+
+def iter_pages_parallel(path: str, page_count: int, workers: int, option: str = "text"):
+    for texts in _map_ranges(path, _page_ranges(page_count, workers), workers, option):
+        yield from texts
+
+
+def iter_pages(raw: PdfSource, option: str = "text", workers: int = None):
+    """
+    按页序逐页产出 page.get_text(option) 的结果("text" 为字符串,"words" 为单词坐标列表)。
+    workers=None 时按页数和 CPU 数自动决定。
+    """
+    doc = open_pdf(raw)
+    page_count = doc.page_count
+    if workers is None:
+        workers = auto_workers(page_count)
+    if workers <= 1:
+        try:
+            yield from iter_pages_serial(doc, option)
+        finally:
+            doc.close()
+        return
+    doc.close()
+    with pdf_path(raw) as path:
+        yield from iter_pages_parallel(path, page_count, workers, option)
+
+
+def _runs(indices, step: int):
+    """升序页码 → 连续页码区间,每段不超过 step 页。"""
+    runs = []
+    for i in indices:
+        if runs and runs[-1][1] == i and runs[-1][1] - runs[-1][0] < step:
+            runs[-1][1] = i + 1
+        else:
+            runs.append([i, i + 1])
+    return runs
+
+
+def iter_selected_pages(raw: PdfSource, indices, option: str = "text", workers: int = None):
+    """只提取指定页码,按页码升序逐页产出 (页码, 结果)。要提取的页数多时交给进程池,按连续区间分任务。"""
+    indices = sorted(indices)
+    if not indices:
+        return
+    if workers is None:
+        workers = auto_workers(len(indices))
+    if workers <= 1:
+        doc = open_pdf(raw)
+        try:
+            for i in indices:
+                yield i, doc[i].get_text(option)
+        finally:
+            doc.close()
+        return
+
+    step = max(MIN_PAGES_PER_TASK, -(-len(indices) // (workers * 4)))
+    runs = _runs(indices, step)
+    with pdf_path(raw) as path:
+        for (start, _), texts in zip(runs, _map_ranges(path, runs, workers, option)):
+            yield from enumerate(texts, start)
+
+
+def extract_pages(raw: PdfSource, indices, option: str = "text", workers: int = None) -> dict:
+    """只提取指定页码 → {页码: 结果}。"""
+    return dict(iter_selected_pages(raw, indices, option, workers))
+
+
+def iter_page_texts(raw: PdfSource, workers: int = None):
+    return iter_pages(raw, "text", workers)
+
+
+def iter_page_words(raw: PdfSource, workers: int = None):
+    return iter_pages(raw, "words", workers)
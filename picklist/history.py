@@ -0,0 +1,208 @@
+"""
+拣货历史(本地 SQLite)
+
+每份解析过的 PDF 存一行(按内容 sha256 去重),明细按 SKU / B链编码各存一行:
+- files:文件哈希(主键)、文件名、解析时间、日期、解析模式、对照表版本、各项件数、对账结果
+- sku_counts:(哈希, SKU, 前缀, 尺码, 件数, 日期);按 (前缀, 日期) 和 (日期, 前缀) 各建一个
+  覆盖索引,"某款上个月拣了多少"之类的汇总只读索引,不回表
+- b_chain_counts:(哈希, 编码, 件数, 日期),按 (编码, 日期) 建索引
+
+同一份 PDF 只存一次;解析前先查历史,模式和对照表都相同时直接用存下的结果,不再解析。
+对照表或模式换了再解析同一份文件时,覆盖原来那一行的结果(历史总是反映最新的对照表),
+解析时间和日期保留第一次解析时的,不会把旧单子算到今天。
+
+数据库位置:PICKLIST_HISTORY_DB(默认仓库根目录 history/picklist.sqlite3)。
+每次操作单独开连接,可以在多个线程 / 会话里同时用。解析流程里用 lookup() / save(),
+数据库出错时不影响解析,原因记在 HistoryStore.error。
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from datetime import date, datetime
+
+import pandas as pd
+
+from picklist.parser import ParseResult
+
+HISTORY_DB = os.environ.get(
+    "PICKLIST_HISTORY_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "history", "picklist.sqlite3"),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    digest            TEXT PRIMARY KEY,
+    name              TEXT NOT NULL,
+    parsed_at         TEXT NOT NULL,
+    day               TEXT NOT NULL,
+    mode              TEXT NOT NULL,
+    catalog_version   INTEGER,
+    catalog_digest    TEXT,
+    expected_total    INTEGER NOT NULL,
+    total_qty         INTEGER NOT NULL,
+    bundle_extra      INTEGER NOT NULL,
+    mystery_units     INTEGER NOT NULL,
+    binder_units      INTEGER NOT NULL,
+    choose_sets_units INTEGER NOT NULL,
+    reconciliation    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_day ON files (day);
+
+CREATE TABLE IF NOT EXISTS sku_counts (
+    digest TEXT NOT NULL REFERENCES files (digest) ON DELETE CASCADE,
+    sku    TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    size   TEXT NOT NULL,
+    qty    INTEGER NOT NULL,
+    day    TEXT NOT NULL,
+    PRIMARY KEY (digest, sku)
+);
+CREATE INDEX IF NOT EXISTS sku_prefix_day ON sku_counts (prefix, day, size, qty);
+CREATE INDEX IF NOT EXISTS sku_day_prefix ON sku_counts (day, prefix, size, qty);
+
+CREATE TABLE IF NOT EXISTS b_chain_counts (
+    digest TEXT NOT NULL REFERENCES files (digest) ON DELETE CASCADE,
+    code   TEXT NOT NULL,
+    qty    INTEGER NOT NULL,
+    day    TEXT NOT NULL,
+    PRIMARY KEY (digest, code)
+);
+CREATE INDEX IF NOT EXISTS b_chain_code_day ON b_chain_counts (code, day, qty);
+CREATE INDEX IF NOT EXISTS b_chain_day_code ON b_chain_counts (day, code, qty);
+"""
+
+RESULT_FIELDS = ("expected_total", "bundle_extra", "mystery_units", "binder_units", "choose_sets_units")
+
+
+def split_sku(sku: str) -> tuple:
+    """"NOF003-M" → ("NOF003", "M");无尺寸 SKU 尺码为空串。与 build_pivot 的拆法一致。"""
+    prefix, _, size = sku.partition("-")
+    return prefix, size
+
+
+class HistoryStore:
+    def __init__(self, path: str = None):
+        self.path = path or HISTORY_DB
+        self.error = None
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self):
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    if os.path.dirname(self.path):
+                        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    with closing(sqlite3.connect(self.path)) as con:
+                        con.execute("PRAGMA journal_mode=WAL")
+                        con.executescript(SCHEMA)
+                    self._ready = True
+        with closing(sqlite3.connect(self.path, timeout=10)) as con:
+            con.execute("PRAGMA foreign_keys=ON")
+            with con:
+                yield con
+
+    # ------------------------------------------------------------------
+    # 写入 / 去重
+    # ------------------------------------------------------------------
+    def load_result(self, digest: str, mode: str, catalog_digest: str):
+        """同一份文件以相同模式、相同对照表解析过时,从历史还原 ParseResult;否则返回 None。"""
+        with self._connect() as con:
+            row = con.execute(
+                f"SELECT {', '.join(RESULT_FIELDS)} FROM files WHERE digest = ? AND mode = ? AND catalog_digest = ?",
+                (digest, mode, catalog_digest),
+            ).fetchone()
+            if row is None:
+                return None
+            skus = con.execute("SELECT sku, qty FROM sku_counts WHERE digest = ?", (digest,)).fetchall()
+            b_chain = con.execute("SELECT code, qty FROM b_chain_counts WHERE digest = ?", (digest,)).fetchall()
+        return ParseResult(sku_counts=dict(skus), b_chain_counts=dict(b_chain), **dict(zip(RESULT_FIELDS, row)))
+
+    def record(self, digest: str, name: str, mode: str, catalog, result: ParseResult, when: datetime = None):
+        """
+        存一份解析结果。已有同一哈希时整行覆盖(明细随 ON DELETE CASCADE 一起换掉),
+        解析时间和日期沿用原来那一行的。
+        """
+        when = when or datetime.now()
+        parsed_at, day = when.isoformat(timespec="seconds"), when.date().isoformat()
+        with self._connect() as con:
+            row = con.execute("SELECT parsed_at, day FROM files WHERE digest = ?", (digest,)).fetchone()
+            if row is not None:
+                parsed_at, day = row
+                con.execute("DELETE FROM files WHERE digest = ?", (digest,))
+            con.execute(
+                "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (digest, name, parsed_at, day, mode, catalog.version, catalog.digest,
+                 result.expected_total, result.total_qty, result.bundle_extra, result.mystery_units,
+                 result.binder_units, result.choose_sets_units, result.reconciliation),
+            )
+            con.executemany(
+                "INSERT INTO sku_counts VALUES (?, ?, ?, ?, ?, ?)",
+                [(digest, sku, *split_sku(sku), qty, day) for sku, qty in result.sku_counts.items()],
+            )
+            con.executemany(
+                "INSERT INTO b_chain_counts VALUES (?, ?, ?, ?)",
+                [(digest, code, qty, day) for code, qty in result.b_chain_counts.items()],
+            )
+
+    def lookup(self, digest: str, mode: str, catalog_digest: str):
+        """load_result(),数据库出错时返回 None。"""
+        try:
+            return self.load_result(digest, mode, catalog_digest)
+        except (sqlite3.Error, OSError) as e:
+            self.error = f"读取拣货历史失败:{e}"
+            return None
+
+    def save(self, digest: str, name: str, mode: str, catalog, result: ParseResult):
+        """record(),数据库出错时只记下原因。"""
+        try:
+            self.record(digest, name, mode, catalog, result)
+            self.error = None
+        except (sqlite3.Error, OSError) as e:
+            self.error = f"写入拣货历史失败:{e}"
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+    def files(self, start: date, end: date) -> pd.DataFrame:
+        with self._connect() as con:
+            return pd.read_sql_query(
+                "SELECT day, parsed_at, name, mode, catalog_version, expected_total, bundle_extra, total_qty, "
+                "reconciliation, digest FROM files WHERE day BETWEEN ? AND ? ORDER BY parsed_at DESC",
+                con, params=(start.isoformat(), end.isoformat()),
+            )
+
+    def sku_totals(self, start: date, end: date, prefixes=None) -> pd.DataFrame:
+        """日期范围内各 (前缀, 尺码) 的件数合计,列为 prefix / size / qty / files。"""
+        sql = ("SELECT prefix, size, SUM(qty) AS qty, COUNT(*) AS files FROM sku_counts "
+               "WHERE day BETWEEN ? AND ?")
+        params = [start.isoformat(), end.isoformat()]
+        if prefixes:
+            prefixes = list(prefixes)
+            sql += f" AND prefix IN ({', '.join('?' * len(prefixes))})"
+            params += prefixes
+        sql += " GROUP BY prefix, size"
+        with self._connect() as con:
+            return pd.read_sql_query(sql, con, params=params)
+
+    def daily_totals(self, start: date, end: date, prefix: str) -> pd.DataFrame:
+        """某个前缀每天各尺码的件数,列为 day / size / qty。"""
+        with self._connect() as con:
+            return pd.read_sql_query(
+                "SELECT day, size, SUM(qty) AS qty FROM sku_counts "
+                "WHERE prefix = ? AND day BETWEEN ? AND ? GROUP BY day, size ORDER BY day",
+                con, params=(prefix, start.isoformat(), end.isoformat()),
+            )
+
+    def b_chain_totals(self, start: date, end: date) -> pd.DataFrame:
+        with self._connect() as con:
+            return pd.read_sql_query(
+                "SELECT code, SUM(qty) AS qty FROM b_chain_counts WHERE day BETWEEN ? AND ? GROUP BY code",
+                con, params=(start.isoformat(), end.isoformat()),
+            )
+
+
+HISTORY = HistoryStore()
@@ -0,0 +1,269 @@
+"""
+增量解析:同一天多次导出的拣货单,没变的页直接用上次的结果
+
+运营常在补单后重新导出当天的拣货单,大部分页与上一份完全相同。这里按页缓存:
+- 页指纹:页面内容流(原始字节)+ 用到的字体对象 / ToUnicode / XObject,
+  不做文字提取就能算出,千页约几十毫秒
+- 每页缓存提取出的文字(单页超过 MAX_CACHED_PAGE_CHARS 的不缓存),以及这一页单独解析的计数;
+  新上传的 PDF 只提取、匹配指纹没见过的页
+- 跨页的部分(页尾 SKU 的数量在下一页、"NOF00 / 3-M" 断在页缝、Choose 块跨页)
+  用"页缝修正"补上:取上一页末尾和下一页开头各 SEAM 个字符,
+  修正 = 解析(尾 + 头) − 解析(尾) − 解析(头)。离页缝远的行项目在三者里完全相同,
+  互相抵消;只有受页缝影响的行项目被换成跨页解析的结果。页缝修正同样按
+  (上一页指纹, 下一页指纹) 缓存
+- Choose 块在页尾没结束时,尾部从块的起点开始取;块跨过整页,或者中间某页
+  短到不足 OVERLAP 个字符时,页缝修正不再是局部的,退回整份按页流式解析
+  (文字照样来自页缓存,不重复提取)
+- 一页都没见过的新单子直接整份流式解析(单页计数 + 页缝修正比一遍流式解析慢),
+  只缓存页文字;单页计数和页缝修正在第一次重新导出时再算,此后的导出只算变了的页
+- 和 parser 的流式解析一样逐页处理:页文字按页序边提取边用,手上只留上一页(算页缝用),
+  单页计数和页缝修正随手累加,内存不随页数增长(页缓存本身按总字节数封顶)
+
+计数全部可加减,合并后与整份解析逐项一致(bench/incremental_check.py 校验)。
+"""
+
+import hashlib
+from collections import defaultdict
+from dataclasses import replace
+from typing import NamedTuple
+
+from picklist.cache import ParseCache
+from picklist.extract import PdfSource, extract_pages, iter_selected_pages, open_pdf, source_size
+from picklist.parser import (
+    OVERLAP, LineItemScanner, ParseResult, Tally, fix_orphan_digit_before_size, normalize_text, parse_pages,
+)
+from picklist.perf import Perf
+from picklist.skus import SkuCatalog, get_catalog
+
+# 页缝两侧各取的字符数:受页缝影响的行项目都起于页尾 OVERLAP 个字符内(最长的数量前瞻),
+# 再留出断行修复和词边界需要的上文
+SEAM = OVERLAP + 100
+TOTAL_FIELDS = ("bundle_extra", "mystery_units", "binder_units", "choose_sets_units")
+# 单页文字超过这个长度就不放进页缓存,免得一页挤掉一大批别的页
+MAX_CACHED_PAGE_CHARS = 256 * 1024
+
+
+class Partial(NamedTuple):
+    """一段文字的计数(页缝修正可以为负)。"""
+    sku_counts: dict
+    b_chain_counts: dict
+    totals: tuple               # 与 TOTAL_FIELDS 对应
+    item_qty: int = None        # 这段文字里第一个 Item quantity
+    open_choose: int = None     # 段末仍未结算的 Choose 块起点(修复后文字中的位置)
+
+
+class NonLocalSeam(Exception):
+    """页缝的影响超出相邻两页,只能整份解析。"""
+
+
+def _size(value) -> int:
+    if isinstance(value, str):
+        return len(value) * 2 + 64
+    return 80 * (len(value.sku_counts) + len(value.b_chain_counts)) + 200
+
+
+# 页文字、单页计数、页缝修正共用一个缓存,按估算内存淘汰
+PAGE_CACHE = ParseCache(max_entries=100_000, max_bytes=128 * 1024 * 1024, sizeof=_size)
+
+
+# ============================================================================
+# 页指纹
+# ============================================================================
+def page_fingerprints(doc) -> list:
+    """
+    每页一个指纹。内容流和字体(含 ToUnicode 映射)都相同的页,提取出的文字必然相同;
+    内容流按原始(压缩)字节哈希,不解压。
+    """
+    memo = {}
+
+    def obj_digest(xref: int) -> bytes:
+        if xref not in memo:
+            h = hashlib.sha256(doc.xref_object(xref, compressed=True).encode())
+            if doc.xref_is_stream(xref):
+                h.update(doc.xref_stream_raw(xref))
+            for key in ("ToUnicode", "DescendantFonts", "FontDescriptor"):
+                kind, val = doc.xref_get_key(xref, key)
+                if kind == "xref":
+                    h.update(obj_digest(int(val.split()[0])))
+                elif kind == "array":
+                    for ref in val.strip("[]").split(" R"):
+                        if ref.strip():
+                            h.update(obj_digest(int(ref.split()[0])))
+            memo[xref] = h.digest()
+        return memo[xref]
+
+    out = []
+    for page in doc:
+        h = hashlib.sha256(f"{page.rect}|{page.rotation}".encode())
+        for xref in page.get_contents():
+            h.update(doc.xref_stream_raw(xref))
+        for font in page.get_fonts():
+            if font[0]:
+                h.update(obj_digest(font[0]))
+        for xobj in page.get_xobjects():
+            h.update(obj_digest(xobj[0]))
+        out.append(h.hexdigest())
+    return out
+
+
+# ============================================================================
+# 局部解析与合并
+# ============================================================================
+def scan_partial(text: str, catalog: SkuCatalog) -> Partial:
+    scanner = LineItemScanner(catalog)
+    tally = Tally(catalog)
+    for item in scanner.feed(fix_orphan_digit_before_size(text, catalog)) + scanner.finish():
+        tally.add(item)
+    return Partial(
+        dict(tally.sku_counts), dict(tally.b_chain_counts),
+        tuple(getattr(tally, f) for f in TOTAL_FIELDS),
+        scanner.expected_total, scanner.unclosed_choose,
+    )
+
+
+def seam_correction(prev_text: str, prev: Partial, next_text: str, next_is_last: bool,
+                    catalog: SkuCatalog) -> Partial:
+    """prev_text / next_text 是两页在全文中的样子(非首页带开头的换行)。"""
+    start = max(0, len(prev_text) - SEAM)
+    if prev.open_choose is not None:
+        # 修复只会删字符,修复后的位置 ≤ 原文位置,从这里切一定包含 "Choose"
+        start = min(start, prev.open_choose)
+    tail = prev_text[start:]
+
+    width = SEAM
+    while True:
+        head = next_text[:width]
+        joined = scan_partial(tail + head, catalog)
+        if joined.open_choose is None or width >= len(next_text):
+            break
+        width *= 2
+    if joined.open_choose is not None and not next_is_last and head == next_text:
+        # 块可能从上一页一直延续到下一页之后,相邻两页的修正管不到
+        if scan_partial(next_text, catalog).open_choose is None:
+            raise NonLocalSeam
+
+    return _combine([(joined, 1), (scan_partial(tail, catalog), -1), (scan_partial(head, catalog), -1)])
+
+
+def _combine(signed) -> Partial:
+    sku, b_chain = defaultdict(int), defaultdict(int)
+    totals = [0] * len(TOTAL_FIELDS)
+    for part, sign in signed:
+        for k, v in part.sku_counts.items():
+            sku[k] += sign * v
+        for k, v in part.b_chain_counts.items():
+            b_chain[k] += sign * v
+        for i, v in enumerate(part.totals):
+            totals[i] += sign * v
+    item_qty = next((p.item_qty for p, _ in signed if p.item_qty is not None), None)
+    return Partial({k: v for k, v in sku.items() if v}, {k: v for k, v in b_chain.items() if v},
+                   tuple(totals), item_qty)
+
+
+def merge_partials(parts) -> ParseResult:
+    """按页序排好的 [单页计数, 页缝修正, 单页计数, …] → ParseResult。Item quantity 取第一个。"""
+    merged = _combine([(p, 1) for p in parts])
+    totals = dict(zip(TOTAL_FIELDS, merged.totals))
+    sku_counts = dict(merged.sku_counts)
+    if totals["choose_sets_units"] > 0:
+        sku_counts["__CHOOSE_SETS__"] = sku_counts.get("__CHOOSE_SETS__", 0) + totals["choose_sets_units"]
+    return ParseResult(sku_counts=sku_counts, b_chain_counts=dict(merged.b_chain_counts),
+                       expected_total=merged.item_qty or 0, **totals)
+
+
+def parse_page_texts(texts, fingerprints, catalog: SkuCatalog = None, perf: Perf = None) -> ParseResult:
+    """
+    逐页文字 + 页指纹 → ParseResult,单页计数和页缝修正尽量用缓存。
+    texts 是规范化前的原文(与 parse_pages 的输入相同):列表,或每次调用都从头逐页产出的函数
+    (退回整份解析时要再读一遍)。逐页处理,只留着上一页的文字。
+    """
+    catalog = catalog or get_catalog()
+    perf = perf or Perf()
+    restart = texts if callable(texts) else (lambda: iter(texts))
+    n = len(fingerprints)
+
+    def cached(key, compute):
+        value = PAGE_CACHE.get(key)
+        if value is None:
+            value = compute()
+            PAGE_CACHE.put(key, value)
+        else:
+            perf.count(key.split(":", 1)[0] + "_reused")
+        return value
+
+    total = _combine([])
+    prev_page = prev_local = None
+    try:
+        for i, (fp, text) in enumerate(zip(fingerprints, restart())):
+            with perf.stage("normalize"):
+                page = normalize_text(text) if i == 0 else "\n" + normalize_text(text)
+            if 0 < i < n - 1 and len(page) < OVERLAP:
+                raise NonLocalSeam
+            with perf.stage("match"):
+                local = cached(f"local:{fp}:{i == 0}:{catalog.digest}", lambda: scan_partial(page, catalog))
+            parts = [(total, 1)]
+            if i:
+                with perf.stage("seams"):
+                    key = f"seam:{fingerprints[i - 1]}:{fp}:{i == 1}:{i == n - 1}:{catalog.digest}"
+                    parts.append((cached(key, lambda: seam_correction(
+                        prev_page, prev_local, page, i == n - 1, catalog)), 1))
+            total = _combine(parts + [(local, 1)])
+            prev_page, prev_local = page, local
+    except NonLocalSeam:
+        perf.count("fallback")
+        return _parse_all(restart(), catalog, perf)
+    return replace(merge_partials([total]), perf=perf.as_dict())
+
+
+def _parse_all(texts, catalog: SkuCatalog, perf: Perf) -> ParseResult:
+    with perf.stage("match"):
+        result = parse_pages(texts, catalog)
+    return replace(result, perf=perf.as_dict())
+
+
+def _iter_texts(raw: PdfSource, fingerprints, workers: int = None):
+    """按页序产出各页原文:缓存里有的直接用,其余边提取边放进缓存。"""
+    missing = [i for i, fp in enumerate(fingerprints) if f"text:{fp}" not in PAGE_CACHE]
+    extracted = iter_selected_pages(raw, missing, workers=workers)
+    upcoming = next(extracted, None)
+    for i, fp in enumerate(fingerprints):
+        if upcoming is not None and upcoming[0] == i:
+            text = upcoming[1]
+            upcoming = next(extracted, None)
+            if len(text) <= MAX_CACHED_PAGE_CHARS:
+                PAGE_CACHE.put(f"text:{fp}", text)
+        else:
+            text = PAGE_CACHE.get(f"text:{fp}")
+            if text is None:
+                # 刚才还在,这期间被别的会话挤出了缓存
+                text = extract_pages(raw, [i], workers=1)[i]
+        yield text
+
+
+def parse_pdf_incremental(raw: PdfSource, workers: int = None, catalog: SkuCatalog = None) -> ParseResult:
+    """
+    与 parser.parse_pdf 结果相同;指纹见过的页不再提取和匹配。
+    perf.counts 里 pages_reused / pages_parsed 为复用 / 新提取的页数。
+    """
+    catalog = catalog or get_catalog()
+    perf = Perf()
+    perf.declare("fingerprint", "extract", "normalize", "match", "seams")
+    perf.count("bytes", source_size(raw))
+    with perf.stage("fingerprint"):
+        doc = open_pdf(raw)
+        try:
+            fingerprints = page_fingerprints(doc)
+        finally:
+            doc.close()
+
+    missing = sum(f"text:{fp}" not in PAGE_CACHE for fp in fingerprints)
+    perf.count("pages", len(fingerprints))
+    perf.count("pages_reused", len(fingerprints) - missing)
+    perf.count("pages_parsed", missing)
+
+    def texts():
+        return perf.iter("extract", _iter_texts(raw, fingerprints, workers))
+
+    if missing == len(fingerprints):
+        return _parse_all(texts(), catalog, perf)
+    return parse_page_texts(texts, fingerprints, catalog, perf)
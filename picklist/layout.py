@@ -0,0 +1,170 @@
+"""
+版面解析模式:按单词坐标读取拣货单表格
+
+文本模式按字符流猜数量(SKU 后 50 / 80 / 300 个字符内的第一个数字),商品名换行时
+容易取错。版面模式用 page.get_text("words") 的坐标:
+1. 每页找一次表头(Seller SKU / Qty / Tracking number …),确定各列的横向边界;
+   续页没有表头时沿用上一页的列
+2. Qty 列里的数字作为行锚点,其余单词按纵坐标归到所属行、按横坐标归到所属列
+3. 同一格内的单词按阅读顺序拼接 —— 断成两行的 SKU(NOF00 / 3-M)自然拼回,
+   不需要 fix_orphan_digit_before_size
+
+首页找不到表头时退回文本模式。
+"""
+
+import re
+from bisect import bisect_right
+from dataclasses import replace
+
+from picklist.extract import PdfSource, iter_page_words, source_size
+from picklist.parser import (
+    CHOOSE_SETS, CHOOSE_SETS_RE, ITEM_QTY_RE,
+    LineItem, ParseResult, Tally, classify, line_item_re, normalize_text, parse_pdf,
+)
+from picklist.perf import Perf
+from picklist.skus import SkuCatalog, get_catalog
+
+# 列名 → 表头文字(小写,按单词切分后逐词比对)
+COLUMN_HEADERS = {
+    "product": ("product name", "product"),
+    "sku": ("seller sku",),
+    "qty": ("qty", "quantity"),
+    "tracking": ("tracking number", "tracking no.", "tracking id"),
+}
+REQUIRED_COLUMNS = ("sku", "qty")
+
+QTY_CELL_RE = re.compile(r'[1-9]\d{0,2}')
+TRACKING_CELL_RE = re.compile(r'\d{15,20}')
+# 锚点上方多少倍行高以内的单词仍属于该行(单元格垂直居中时 SKU 第一行会略高于数量)
+ROW_TOP_TOLERANCE = 0.6
+# 最后一行向下最多延伸的行高倍数
+LAST_ROW_LINES = 6
+# 纵坐标相差不到这么多(pt)的单词视为同一行
+LINE_SNAP = 2.0
+
+
+class Columns:
+    def __init__(self, names: list, bounds: list):
+        self.names = names      # 按横坐标排序的列名
+        self.bounds = bounds    # 相邻两列之间的分界线 x,长度 = len(names) - 1
+
+    def of(self, x0: float, x1: float) -> str:
+        return self.names[bisect_right(self.bounds, (x0 + x1) / 2)]
+
+
+def _lines(words):
+    """按纵坐标把单词分成视觉上的行(相差不到 LINE_SNAP 视为同一行),行内按横坐标排序。"""
+    lines, last_y = [], None
+    for w in sorted(words, key=lambda w: w[1]):
+        if last_y is None or w[1] - last_y > LINE_SNAP:
+            lines.append([])
+        lines[-1].append(w)
+        last_y = w[1]
+    return [sorted(line, key=lambda w: w[0]) for line in lines]
+
+
+def find_columns(words):
+    for line in _lines(words):
+        lowered = [w[4].lower() for w in line]
+        found = {}
+        for name, labels in COLUMN_HEADERS.items():
+            for label in labels:
+                parts = label.split()
+                for i in range(len(lowered) - len(parts) + 1):
+                    if lowered[i:i + len(parts)] == parts:
+                        found[name] = (line[i][0], line[i + len(parts) - 1][2])
+                        break
+                if name in found:
+                    break
+        if all(c in found for c in REQUIRED_COLUMNS):
+            ordered = sorted(found.items(), key=lambda kv: kv[1][0])
+            bounds = [(a[1][1] + b[1][0]) / 2 for a, b in zip(ordered, ordered[1:])]
+            return Columns([name for name, _ in ordered], bounds)
+    return None
+
+
+def _cell_text(words, sep: str) -> str:
+    return sep.join(normalize_text(w[4]) for line in _lines(words) for w in line)
+
+
+def page_rows(words, columns: Columns):
+    """一页的表格行:[{列名: 单元格文字}]。"""
+    anchors = sorted(
+        (w for w in words if columns.of(w[0], w[2]) == "qty" and QTY_CELL_RE.fullmatch(w[4])),
+        key=lambda w: w[1],
+    )
+    if not anchors:
+        return []
+    line_h = sorted(w[3] - w[1] for w in anchors)[len(anchors) // 2]
+    tops = [a[1] - ROW_TOP_TOLERANCE * line_h for a in anchors]
+    bottom = anchors[-1][3] + LAST_ROW_LINES * line_h
+
+    cells = [{} for _ in anchors]
+    for w in words:
+        i = bisect_right(tops, w[1]) - 1
+        if i < 0 or w[1] > bottom:
+            continue
+        cells[i].setdefault(columns.of(w[0], w[2]), []).append(w)
+
+    rows = []
+    for a, row in zip(anchors, cells):
+        rows.append({
+            "qty": int(a[4]),
+            "sku": _cell_text(row.get("sku", []), ""),
+            "product": _cell_text(row.get("product", []), " "),
+            "tracking": next((w[4] for w in row.get("tracking", []) if TRACKING_CELL_RE.fullmatch(w[4])), ""),
+        })
+    return rows
+
+
+def row_items(row, catalog: SkuCatalog):
+    sku, qty, tracking = row["sku"], row["qty"], row["tracking"]
+    pattern = line_item_re(catalog.b_chain_codes, catalog.prefixes.irregular)
+    items = [
+        LineItem(kind, code, qty, tracking)
+        for m in pattern.finditer(sku) if m.lastgroup in ("bundle", "code")
+        for kind, code, _ in classify(sku, m, catalog)
+    ]
+    if not items and CHOOSE_SETS_RE.search(row["product"]):
+        items.append(LineItem(CHOOSE_SETS, "", qty, tracking))
+    return items
+
+
+def parse_word_pages(word_pages, catalog: SkuCatalog = None, perf: Perf = None):
+    """按页的 get_text("words") 结果 → ParseResult;首页没有表头时返回 None。"""
+    catalog = catalog or get_catalog()
+    perf = perf or Perf()
+    tally = Tally(catalog)
+    expected_total = None
+    columns = None
+    for words in perf.iter("extract", word_pages):
+        perf.count("pages")
+        perf.count("words", len(words))
+        with perf.stage("columns"):
+            columns = find_columns(words) or columns
+            if columns is None:
+                return None
+            if expected_total is None:
+                for line in _lines(words):
+                    m = ITEM_QTY_RE.search(" ".join(w[4] for w in line))
+                    if m:
+                        expected_total = int(m.group(1))
+                        break
+        with perf.stage("rows"):
+            rows = page_rows(words, columns)
+        with perf.stage("match"):
+            for row in rows:
+                for item in row_items(row, catalog):
+                    tally.add(item)
+                    perf.count(item.kind)
+    return replace(tally.result(expected_total or 0), perf=perf.as_dict())
+
+
+def parse_pdf_layout(raw: PdfSource, workers: int = None, catalog: SkuCatalog = None) -> ParseResult:
+    perf = Perf()
+    perf.count("bytes", source_size(raw))
+    result = parse_word_pages(iter_page_words(raw, workers), catalog, perf)
+    if result is None:
+        # 找不到表头(非标准导出),退回文本模式
+        return parse_pdf(raw, workers, catalog)
+    return result
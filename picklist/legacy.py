@@ -0,0 +1,169 @@
+"""
+旧版整篇多遍扫描解析(重构前 app.py 的原始逻辑,逐字保留)
+
+不在线上使用,只作为基准:bench/ 里的脚本用它对比新解析器的速度,
+并核对 sku_counts 与对账数字是否完全一致。
+"""
+
+import re
+from collections import defaultdict
+
+import fitz
+
+from picklist.parser import ParseResult
+from picklist.skus import get_catalog
+
+B_CHAIN_SKUS_SET = get_catalog().b_chain_codes
+B_CHAIN_RE = re.compile(r'\b(' + '|'.join(B_CHAIN_SKUS_SET) + r')\b')
+QTY_WITH_TRACKING = re.compile(r'\b([1-9]\d{0,2})\s+\d{15,20}\b')
+
+SKU_BUNDLE = re.compile(r'((?:[A-Z]{3}\d{3}|NF001){1,4}-[SML])', re.DOTALL)
+QTY_AFTER  = re.compile(r'\b([1-9]\d{0,2})\b')
+ITEM_QTY_RE = re.compile(r"Item\s+quantity[:：]?\s*(\d+)", re.I)
+NM_ONLY = re.compile(r'\bNF001\b')
+NB_ONLY = re.compile(r'\bNB001\b')
+CHOOSE_SETS_RE = re.compile(r'Choose\s+\d+\s+Sets', re.I)
+
+
+def normalize_text(t: str) -> str:
+    return t.replace("\u00ad","").replace("\u200b","").replace("\u00a0"," ").replace("–","-").replace("—","-")
+
+
+def fix_orphan_digit_before_size(txt: str) -> str:
+    pattern = re.compile(r'(?P<prefix>(?:[A-Z]{3}\d{3}|NM001){0,3}[A-Z]{3}\d{2})\s*[\r\n]+\s*(?P<d>\d)\s*-\s*(?P<size>[SML])')
+    def _join(m): return f"{m.group('prefix')}{m.group('d')}-{m.group('size')}"
+    prev, cur = None, txt
+    while prev != cur:
+        prev, cur = cur, pattern.sub(_join, cur)
+    return cur
+
+
+def parse_code_parts(code: str):
+    parts, i, n = [], 0, len(code)
+    while i < n:
+        if code.startswith('NM001', i):
+            parts.append('NM001'); i += 5; continue
+        seg = code[i:i+6]
+        if re.fullmatch(r'[A-Z]{3}\d{3}', seg):
+            parts.append(seg); i += 6; continue
+        return None
+    return parts if 1 <= len(parts) <= 4 else None
+
+
+def expand_bundle(counter: dict, sku_with_size: str, qty: int):
+    s = re.sub(r'\s+', '', sku_with_size)
+    if '-' not in s:
+        counter[s] += qty
+        return 0, (qty if s == 'NF001' else 0)
+    code, size = s.split('-', 1)
+    parts = parse_code_parts(code)
+    if parts:
+        mystery_units = 0
+        for p in parts:
+            key = f"{p}-{size}"
+            counter[key] += qty
+            if p == 'NF001':
+                mystery_units += qty
+        extra = (len(parts) - 1) * qty
+        return extra, mystery_units
+    counter[s] += qty
+    return 0, (qty if code == 'NF001' else 0)
+
+
+def count_choose_sets_items(text: str) -> int:
+    total = 0
+    positions = [m.start() for m in CHOOSE_SETS_RE.finditer(text)]
+    if not positions:
+        return 0
+    positions.append(len(text))
+    qty_pattern = re.compile(r'\b([1-9]\d{0,2})\s+(\d{15,20})\b')
+    for i in range(len(positions) - 1):
+        block = text[positions[i]:positions[i+1]]
+        m_sku = re.search(r'\b[A-Z]{3}\d{3}-[SML]\b', block)
+        if m_sku:
+            block = block[:m_sku.start()]
+        for m in qty_pattern.finditer(block):
+            total += int(m.group(1))
+    return total
+
+
+def extract_text(raw: bytes) -> str:
+    doc = fitz.open(stream=raw, filetype="pdf")
+    text = "\n".join([p.get_text("text") for p in doc])
+    doc.close()
+    return text
+
+
+def match_multipass(text_fixed: str, expected_total: int = 0) -> ParseResult:
+    sku_counts = defaultdict(int)
+    bundle_extra = 0
+    mystery_units = 0
+    binder_units = 0
+
+    for m in SKU_BUNDLE.finditer(text_fixed):
+        sku_raw = re.sub(r'\s+', '', m.group(1))
+        after = text_fixed[m.end(): m.end()+50]
+        mq = QTY_AFTER.search(after)
+        qty = int(mq.group(1)) if mq else 1
+        extra, myst = expand_bundle(sku_counts, sku_raw, qty)
+        bundle_extra += extra
+        mystery_units += myst
+
+    for m in NM_ONLY.finditer(text_fixed):
+        nxt = text_fixed[m.end(): m.end()+3]
+        if '-' in nxt:
+            continue
+        after = text_fixed[m.end(): m.end()+80]
+        mq = QTY_AFTER.search(after)
+        qty = int(mq.group(1)) if mq else 1
+        sku_counts['NF001'] += qty
+        mystery_units += qty
+
+    for m in NB_ONLY.finditer(text_fixed):
+        after = text_fixed[m.end(): m.end()+80]
+        mq = QTY_AFTER.search(after)
+        qty = int(mq.group(1)) if mq else 1
+        sku_counts['NB001'] += qty
+        binder_units += qty
+
+    choose_sets_units = count_choose_sets_items(text_fixed)
+    if choose_sets_units > 0:
+        sku_counts['__CHOOSE_SETS__'] += choose_sets_units
+
+    # 提取 B链产品数量
+    b_chain_counts = defaultdict(int)
+    for m in B_CHAIN_RE.finditer(text_fixed):
+        sku = m.group(1)
+        after = text_fixed[m.end(): m.end() + 300]
+        mq = QTY_WITH_TRACKING.search(after)
+        if mq:
+            qty = int(mq.group(1))
+        else:
+            mq2 = QTY_AFTER.search(after)
+            qty = int(mq2.group(1)) if mq2 else 1
+        b_chain_counts[sku] += qty
+
+    return ParseResult(
+        sku_counts=dict(sku_counts),
+        b_chain_counts=dict(b_chain_counts),
+        expected_total=expected_total,
+        bundle_extra=bundle_extra,
+        mystery_units=mystery_units,
+        binder_units=binder_units,
+        choose_sets_units=choose_sets_units,
+    )
+
+
+def parse_text(text: str) -> ParseResult:
+    text = normalize_text(text)
+
+    m_total = ITEM_QTY_RE.search(text)
+    expected_total = int(m_total.group(1)) if m_total else 0
+
+    text_fixed = fix_orphan_digit_before_size(text)
+
+    return match_multipass(text_fixed, expected_total)
+
+
+def parse_pdf(raw: bytes) -> ParseResult:
+    return parse_text(extract_text(raw))
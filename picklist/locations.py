@@ -0,0 +1,111 @@
+"""
+库位图册(SKU → 库位)
+
+图册 CSV / Parquet 按内容哈希缓存,每份只读一次;读入时就把库位字符串解码成
+排序键,拣货表排序只需按前缀查表,不再逐行跑正则。
+
+支持的库位格式(不区分大小写,分隔符可以是 - _ / 空格):
+    A-01-01   A01-01   B-1-2   AA-12-003   WH2-A-01-01(前面带仓库编号)
+"""
+
+import io
+import re
+
+import pandas as pd
+
+from picklist.cache import ParseCache, content_hash
+
+SKU_COL = "SKU"
+LOCATION_COL = "库位"
+
+LOCATION_RE = re.compile(
+    r'(?:(?P<warehouse>[A-Z0-9]+?)[-_/ ]+)?'
+    r'(?P<zone>[A-Z]{1,2})[-_/ ]*(?P<aisle>\d{1,3})[-_/ ]+(?P<slot>\d{1,3})'
+)
+
+# 排序键:能解码的库位按 (仓库, 区, 通道, 货位) 排;格式无法识别的排在其后;没有库位的排最后
+UNPARSED_KEY = (1,)
+MISSING_KEY = (2,)
+
+
+def decode_location(loc: str):
+    m = LOCATION_RE.fullmatch(loc.upper().replace("－", "-"))
+    if not m:
+        return UNPARSED_KEY if loc else MISSING_KEY
+    wh, zone, aisle, slot = m.groups()
+    return (0, wh or "", len(zone), zone, int(aisle), int(slot))
+
+
+def decode_locations(locations) -> list:
+    """库位字符串 → 排序键列表。相同库位只解码一次。"""
+    memo = {}
+    return [memo[loc] if loc in memo else memo.setdefault(loc, decode_location(loc)) for loc in locations]
+
+
+class LocationIndex:
+    """
+    SKU 前缀 → (库位, 排序键)。只读,会被多个会话共享。
+
+    ranks 把排序键压成整数名次(相同库位名次相同),拣货表可以整列 map 后直接排序。
+    """
+
+    def __init__(self, entries: dict):
+        self._entries = entries
+        self.locations = {prefix: loc for prefix, (loc, _) in entries.items()}
+        order = sorted({key for _, key in entries.values()} | {UNPARSED_KEY, MISSING_KEY})
+        rank_of = {key: i for i, key in enumerate(order)}
+        self.ranks = {prefix: rank_of[key] for prefix, (_, key) in entries.items()}
+        self.unparsed_rank = rank_of[UNPARSED_KEY]
+        self.missing_rank = rank_of[MISSING_KEY]
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "LocationIndex":
+        if SKU_COL not in df.columns or LOCATION_COL not in df.columns:
+            raise ValueError(f"图册缺少 '{SKU_COL}' 或 '{LOCATION_COL}' 列")
+        skus = df[SKU_COL].astype(str).str.strip()
+        locs = df[LOCATION_COL].fillna("").astype(str).str.strip()
+        valid = locs != ""
+        skus, locs = skus[valid], locs[valid]
+        # 同一 SKU 出现多次时以后出现的为准(与 dict(zip(...)) 一致)
+        entries = dict(zip(skus, zip(locs, decode_locations(locs))))
+        return cls(entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, prefix):
+        return prefix in self._entries
+
+    def location(self, prefix: str, default: str = None):
+        entry = self._entries.get(prefix)
+        return entry[0] if entry else default
+
+    @property
+    def unparsed(self) -> int:
+        return sum(1 for _, key in self._entries.values() if key is UNPARSED_KEY)
+
+
+EMPTY_INDEX = LocationIndex({})
+
+
+def read_catalog(raw: bytes, filename: str = "") -> pd.DataFrame:
+    buf = io.BytesIO(raw)
+    if filename.lower().endswith(".parquet"):
+        try:
+            return pd.read_parquet(buf, columns=[SKU_COL, LOCATION_COL])
+        except (KeyError, ValueError):
+            raise ValueError(f"图册缺少 '{SKU_COL}' 或 '{LOCATION_COL}' 列") from None
+    return pd.read_csv(buf, dtype=str, usecols=lambda c: c in (SKU_COL, LOCATION_COL))
+
+
+def _index_size(index: LocationIndex) -> int:
+    # 粗略估算:每条约 300 字节(键、库位字符串、排序键元组)
+    return 300 * len(index) + 100
+
+
+LOCATION_CACHE = ParseCache(max_entries=8, max_bytes=64 * 1024 * 1024, sizeof=_index_size)
+
+
+def load_location_index(raw: bytes, filename: str = "") -> LocationIndex:
+    key = f"{content_hash(raw)}:{filename.lower().endswith('.parquet')}"
+    return LOCATION_CACHE.get_or_compute(key, lambda: LocationIndex.from_frame(read_catalog(raw, filename)))
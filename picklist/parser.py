@@ -0,0 +1,427 @@
+"""
+拣货 PDF 解析
+
+与 Streamlit 无关的纯函数:输入 PDF 字节,输出 ParseResult。
+app.py 通过 picklist.cache 调用,同一份 PDF 在进程内只解析一次。
+
+逐页流式处理(提取 → 规范化 → 断行修复 → 单遍分词 → 计数),不拼接整篇文本,
+峰值内存只和单页大小有关,与页数无关。大 PDF 的提取由 picklist.extract 多进程并行。
+"""
+
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from typing import NamedTuple
+
+from picklist.extract import PdfSource, iter_page_texts, source_size
+from picklist.perf import Perf
+from picklist.skus import SkuCatalog, get_catalog
+
+# ============================================================================
+# 正则
+# ============================================================================
+QTY_AFTER  = re.compile(r'\b([1-9]\d{0,2})\b')
+QTY_WITH_TRACKING = re.compile(r'\b([1-9]\d{0,2})\s+(\d{15,20})\b')
+ITEM_QTY_RE = re.compile(r"Item\s+quantity[:：]?\s*(\d+)", re.I)
+CHOOSE_SETS_RE = re.compile(r'Choose\s+\d+\s+Sets', re.I)
+SIZED_SKU_RE = re.compile(r'\b[A-Z]{3}\d{3}-[SML]\b')
+
+WORD_CHAR = re.compile(r'\w')
+# 与 QTY_AFTER / QTY_WITH_TRACKING 相同,只用于前瞻区的第一个字符:
+# 原逻辑对切片做 search,切片开头的 \b 总是成立
+QTY_HEAD = re.compile(r'([1-9]\d{0,2})\b')
+QTY_TRACKING_HEAD = re.compile(r'([1-9]\d{0,2})\s+(\d{15,20})\b')
+TRACKING_AFTER = re.compile(r'\s+(\d{15,20})\b')
+
+
+def _bundle_part(irregular: frozenset) -> str:
+    """bundle 的一段:常规格式,或对照表里其他形状的前缀(长的在前)。"""
+    codes = sorted(irregular, key=lambda c: (-len(c), c))
+    return r'(?:[A-Z]{3}\d{3}' + ''.join('|' + re.escape(c) for c in codes) + ')'
+
+
+@lru_cache(maxsize=8)
+def line_item_re(b_chain_codes: frozenset, irregular: frozenset) -> re.Pattern:
+    """
+    单遍扫描用的合并正则:一次 finditer 同时识别所有行项目的起点。
+
+    B链编码和 bundle 里非常规格式的前缀(SkuCatalog.prefixes.irregular)来自 SKU 对照表,
+    按对照表的编码集合编译并缓存,对照表热加载后自动换新。
+    上面几条正则的匹配只会在 bundle 起点处重叠(如 NVT001-L 同时是 bundle 和 B链),
+    这种情况由 classify() 补判。
+    Choose 分支只消耗 "Choose" 一词:"CHOOSE 2 SETSNF001-M" 里的 SNF001-M 仍是 bundle。
+    开头的字符类前瞻让 re 引擎跳过不可能起始的位置(İ/ı 是忽略大小写时 i 的等价字符);
+    code 分支前的 \b 改在 Python 里判断,否则前瞻优化失效。
+    """
+    codes = sorted(b_chain_codes, key=lambda c: (-len(c), c))
+    return re.compile(
+        r'(?=[A-Zci\u0130\u0131])(?:'
+        r'(?P<bundle>' + _bundle_part(irregular) + r'{1,4}-[SML])'
+        r'|(?P<code>' + '|'.join(['NF001', 'NB001'] + codes) + r')(?!\w)'
+        r'|(?P<choose>(?i:Choose(?=\s+\d+\s+Sets)))'
+        r'|(?i:Item\s+quantity[:：]?\s*(?P<item_qty>\d+)))'
+    )
+
+
+@lru_cache(maxsize=8)
+def orphan_digit_re(irregular: frozenset) -> re.Pattern:
+    """"NOF00\n3-M" 这类最后一位数字被换行断开的编码;前面可以连着几段完整前缀。"""
+    return re.compile(r'(?P<prefix>' + _bundle_part(irregular) + r'{0,3}[A-Z]{3}\d{2})'
+                      r'\s*[\r\n]+\s*(?P<d>\d)\s*-\s*(?P<size>[SML])')
+
+
+# ============================================================================
+# 解析工具函数
+# ============================================================================
+def normalize_text(t: str) -> str:
+    return t.replace("\u00ad","").replace("\u200b","").replace("\u00a0"," ").replace("–","-").replace("—","-")
+
+
+def fix_orphan_digit_before_size(txt: str, catalog: SkuCatalog = None) -> str:
+    pattern = orphan_digit_re((catalog or get_catalog()).prefixes.irregular)
+    def _join(m): return f"{m.group('prefix')}{m.group('d')}-{m.group('size')}"
+    prev, cur = None, txt
+    while prev != cur:
+        prev, cur = cur, pattern.sub(_join, cur)
+    return cur
+
+
+def parse_code_parts(code: str, catalog: SkuCatalog = None):
+    """连写的 bundle 编码 → 各段前缀;按对照表的前缀字典树拆(结果有缓存),拆不开时为 None。"""
+    return (catalog or get_catalog()).prefixes.split(code)
+
+
+def expand_bundle(counter: dict, sku_with_size: str, qty: int, catalog: SkuCatalog = None):
+    s = "".join(sku_with_size.split())
+    if '-' not in s:
+        counter[s] += qty
+        return 0, (qty if s == 'NF001' else 0)
+    code, size = s.split('-', 1)
+    parts = parse_code_parts(code, catalog)
+    if parts:
+        mystery_units = 0
+        for p in parts:
+            key = f"{p}-{size}"
+            counter[key] += qty
+            if p == 'NF001':
+                mystery_units += qty
+        extra = (len(parts) - 1) * qty
+        return extra, mystery_units
+    counter[s] += qty
+    return 0, (qty if code == 'NF001' else 0)
+
+
+def search_after(buf: str, pos: int, width: int, head=QTY_HEAD, rest=QTY_AFTER):
+    """等价于 rest.search(buf[pos:pos+width]),但不分配切片。"""
+    end = pos + width
+    return head.match(buf, pos, end) or rest.search(buf, pos + 1, end)
+
+
+# ============================================================================
+# 解析结果
+# ============================================================================
+@dataclass(frozen=True)
+class ParseResult:
+    """一份拣货 PDF 的解析结果。会被多个会话共享,调用方不要修改其中的 dict。"""
+    sku_counts: dict = field(default_factory=dict)
+    b_chain_counts: dict = field(default_factory=dict)
+    expected_total: int = 0
+    bundle_extra: int = 0
+    mystery_units: int = 0
+    binder_units: int = 0
+    choose_sets_units: int = 0
+    # 解析时的分阶段埋点(picklist.perf),不参与比较
+    perf: dict = field(default_factory=dict, compare=False, repr=False)
+
+    @property
+    def b_chain_total(self) -> int:
+        return sum(self.b_chain_counts.values())
+
+    @property
+    def total_qty(self) -> int:
+        return sum(self.sku_counts.values()) + self.b_chain_total
+
+    @property
+    def expected_with_bundle(self) -> int:
+        return self.expected_total + self.bundle_extra
+
+    @property
+    def reconciliation(self) -> str:
+        """对账结果:实际提取件数 = PDF 标注(或标注 + bundle 拆分)为一致。"""
+        if self.expected_total == 0:
+            return RECON_UNKNOWN
+        if self.total_qty in (self.expected_with_bundle, self.expected_total):
+            return RECON_OK
+        return RECON_MISMATCH
+
+
+# 对账状态
+RECON_OK = "ok"
+RECON_MISMATCH = "mismatch"
+RECON_UNKNOWN = "unknown"   # PDF 里没有 Item quantity,无法对账
+
+
+# 行项目类型
+NAIL = "nail"               # 甲片 SKU / bundle(带尺码)
+NF001 = "NF001"             # Free Giveaway(无尺码)
+NB001 = "NB001"             # Organizer Binder(无尺码)
+B_CHAIN = "b_chain"         # B链产品
+CHOOSE_SETS = "choose_sets" # Choose N Sets 混合套装
+
+
+class LineItem(NamedTuple):
+    kind: str
+    sku: str            # bundle 原文(如 NOF003NPX014-M);Choose Sets 为空
+    qty: int
+    tracking: str = ""  # 未识别到物流单号时为空
+
+
+def classify(buf: str, m, catalog: SkuCatalog) -> list:
+    """
+    line_item_re() 的一个 bundle / code 匹配 → [(kind, sku, sku 结束位置)]。
+
+    与旧版各条正则的计数规则一致:NF001 后 3 个字符内有 "-" 不单独计数;
+    B链编码带尺码时(如 NVT001-L)既算 bundle 也算 B链。
+    """
+    p, e = m.start(), m.end()
+    if m.lastgroup == 'bundle':
+        sku = m.group('bundle')
+        out = [(NAIL, sku, e)]
+        if sku[:6] in catalog.b_chain_codes:
+            mb = catalog.b_chain_re.match(buf, p)
+            if mb:
+                out.append((B_CHAIN, mb.group(1), mb.end()))
+        return out
+    if p and WORD_CHAR.match(buf, p - 1):
+        return []
+    code = m.group('code')
+    if code == 'NF001':
+        return [] if buf.find('-', e, e + 3) >= 0 else [(NF001, code, e)]
+    if code == 'NB001':
+        return [(NB001, code, e)]
+    return [(B_CHAIN, code, e)]
+
+
+class Tally:
+    """把 LineItem 流汇总成 ParseResult。"""
+
+    def __init__(self, catalog: SkuCatalog = None):
+        self.catalog = catalog or get_catalog()
+        self.sku_counts = defaultdict(int)
+        self.b_chain_counts = defaultdict(int)
+        self.bundle_extra = 0
+        self.mystery_units = 0
+        self.binder_units = 0
+        self.choose_sets_units = 0
+
+    def add(self, item: LineItem):
+        kind, qty = item.kind, item.qty
+        if kind == NAIL:
+            extra, myst = expand_bundle(self.sku_counts, item.sku, qty, self.catalog)
+            self.bundle_extra += extra
+            self.mystery_units += myst
+        elif kind == B_CHAIN:
+            self.b_chain_counts[item.sku] += qty
+        elif kind == NF001:
+            self.sku_counts['NF001'] += qty
+            self.mystery_units += qty
+        elif kind == NB001:
+            self.sku_counts['NB001'] += qty
+            self.binder_units += qty
+        elif kind == CHOOSE_SETS:
+            self.choose_sets_units += qty
+
+    def result(self, expected_total: int) -> ParseResult:
+        sku_counts = self.sku_counts
+        if self.choose_sets_units > 0:
+            sku_counts['__CHOOSE_SETS__'] += self.choose_sets_units
+        return ParseResult(
+            sku_counts=dict(sku_counts),
+            b_chain_counts=dict(self.b_chain_counts),
+            expected_total=expected_total,
+            bundle_extra=self.bundle_extra,
+            mystery_units=self.mystery_units,
+            binder_units=self.binder_units,
+            choose_sets_units=self.choose_sets_units,
+        )
+
+
+# ============================================================================
+# 流式解析:逐页规范化 → 修复断行 → 单遍分词,内存与页数无关
+# ============================================================================
+# 匹配窗口在页与页之间保留的重叠长度:覆盖最长的数量前瞻(B链 300 字符)
+# 加上最长的 bundle 编码,跨页的 SKU / 数量仍能被完整匹配
+OVERLAP = 400
+# 断行修复保留的尾部长度:"NOF00\n3-M" 这类断在页尾的编码留到下一页一起修复。
+# 编码与孤立数字之间的空白不限长度,末尾连着的空白 / 数字 / "-" 整段另外留着(repair_tail_start)
+REPAIR_TAIL = 256
+
+
+def iter_normalized(pages):
+    for i, t in enumerate(pages):
+        t = normalize_text(t)
+        yield t if i == 0 else "\n" + t
+
+
+def repair_tail_start(buf: str) -> int:
+    """
+    断行修复要留到下一段的起点:末尾一段只含空白、数字和 "-" 的字符(孤立数字修复里
+    编码之后的部分只可能是这些),再往前 REPAIR_TAIL 个字符。
+    """
+    i = len(buf)
+    while i and (buf[i - 1].isspace() or buf[i - 1].isdecimal() or buf[i - 1] == "-"):
+        i -= 1
+    return max(0, i - REPAIR_TAIL)
+
+
+def iter_repaired(chunks, catalog: SkuCatalog = None):
+    catalog = catalog or get_catalog()
+    tail = ""
+    for chunk in chunks:
+        buf = fix_orphan_digit_before_size(tail + chunk, catalog)
+        cut = repair_tail_start(buf)
+        if cut:
+            yield buf[:cut]
+        tail = buf[cut:]
+    if tail:
+        yield tail
+
+
+class LineItemScanner:
+    """
+    单遍行项目分词器。
+
+    在滑动窗口上只跑一次 line_item_re(),逐个产出 LineItem;数量和物流单号在
+    原文上按位置匹配,不再为每个 SKU 切出前瞻子串。只处理起点落在
+    "窗口末尾 - OVERLAP" 之前的匹配,保证前瞻取到的文字与整篇文本一致。
+    """
+
+    def __init__(self, catalog: SkuCatalog = None):
+        self.catalog = catalog or get_catalog()
+        self.pattern = line_item_re(self.catalog.b_chain_codes, self.catalog.prefixes.irregular)
+        self.buf = ""
+        self.base = 0                  # buf[0] 在全文中的位置
+        self.pos = 0                   # 下一次扫描的全局起点
+        self.expected_total = None
+        self.choose_start = None       # 尚未结算的 Choose 块起点(全局位置)
+        self.unclosed_choose = None    # finish() 时仍未结算的 Choose 块起点(增量解析拼接页缝用)
+
+    def feed(self, chunk: str) -> list:
+        self.buf += chunk
+        items = self._scan(len(self.buf) - OVERLAP)
+        self._trim()
+        return items
+
+    def finish(self) -> list:
+        items = self._scan(len(self.buf))
+        self.unclosed_choose = self.choose_start
+        if self.choose_start is not None:
+            self._close_choose(len(self.buf), items)
+        return items
+
+    def iter_items(self, chunks):
+        for chunk in chunks:
+            yield from self.feed(chunk)
+        yield from self.finish()
+
+    def _scan(self, limit) -> list:
+        buf = self.buf
+        items = []
+        last_end = start = self.pos - self.base
+        for m in self.pattern.finditer(buf, start):
+            p = m.start()
+            if p >= limit:
+                break
+            last_end = m.end()
+            kind = m.lastgroup
+
+            if kind == 'bundle' or kind == 'code':
+                if kind == 'bundle' and self.choose_start is not None and SIZED_SKU_RE.match(buf, p):
+                    # Choose 块在第一个带尺码 SKU 处截断
+                    self._close_choose(p, items, truncated=True)
+                for item_kind, sku, sku_end in classify(buf, m, self.catalog):
+                    items.append(self._with_lookahead(item_kind, sku, sku_end))
+
+            elif kind == 'choose':
+                if self.choose_start is not None:
+                    self._close_choose(p, items)
+                self.choose_start = self.base + p
+
+            elif self.expected_total is None:
+                self.expected_total = int(m.group('item_qty'))
+
+        self.pos = self.base + max(limit, last_end)
+        return items
+
+    def _with_lookahead(self, kind, sku, e):
+        if kind == NAIL:
+            return self._with_qty(kind, sku, search_after(self.buf, e, 50))
+        if kind == B_CHAIN:
+            return self._b_chain(sku, e)
+        return self._with_qty(kind, sku, search_after(self.buf, e, 80))
+
+    def _with_qty(self, kind, sku, mq):
+        if not mq:
+            return LineItem(kind, sku, 1)
+        mt = TRACKING_AFTER.match(self.buf, mq.end())
+        return LineItem(kind, sku, int(mq.group(1)), mt.group(1) if mt else "")
+
+    def _b_chain(self, sku, e):
+        mq = search_after(self.buf, e, 300, QTY_TRACKING_HEAD, QTY_WITH_TRACKING)
+        if mq:
+            return LineItem(B_CHAIN, sku, int(mq.group(1)), mq.group(2))
+        return self._with_qty(B_CHAIN, sku, search_after(self.buf, e, 300))
+
+    def _close_choose(self, end, items, truncated=False):
+        buf, start = self.buf, self.choose_start - self.base
+        if not truncated:
+            m_sku = SIZED_SKU_RE.search(buf, start, end)
+            if m_sku:
+                end = m_sku.start()
+        for m in QTY_WITH_TRACKING.finditer(buf, start, end):
+            items.append(LineItem(CHOOSE_SETS, "", int(m.group(1)), m.group(2)))
+        self.choose_start = None
+
+    def _trim(self):
+        cut = self.pos
+        if self.choose_start is not None:
+            cut = min(cut, self.choose_start)
+        # 多留 1 个字符,保证窗口开头的 \b 判断与全文一致
+        cut -= self.base + 1
+        if cut > 0:
+            self.buf = self.buf[cut:]
+            self.base += cut
+
+
+def parse_pages(pages, catalog: SkuCatalog = None, perf: Perf = None) -> ParseResult:
+    perf = perf or Perf()
+    perf.declare("extract", "normalize", "orphan fix", "match")
+    catalog = catalog or get_catalog()
+    scanner = LineItemScanner(catalog)
+    tally = Tally(catalog)
+    pages = perf.iter("extract", pages)
+    chunks = perf.iter("orphan fix", iter_repaired(perf.iter("normalize", iter_normalized(pages)), catalog))
+    for chunk in chunks:
+        perf.count("chars", len(chunk))
+        with perf.stage("match"):
+            for item in scanner.feed(chunk):
+                tally.add(item)
+                perf.count(item.kind)
+    with perf.stage("match"):
+        for item in scanner.finish():
+            tally.add(item)
+            perf.count(item.kind)
+    perf.count("pages", perf.stages["extract"]["calls"])
+    return replace(tally.result(scanner.expected_total or 0), perf=perf.as_dict())
+
+
+def parse_text(text: str, catalog: SkuCatalog = None) -> ParseResult:
+    return parse_pages([text], catalog)
+
+
+def parse_pdf(raw: PdfSource, workers: int = None, catalog: SkuCatalog = None) -> ParseResult:
+    """raw 为 PDF 字节或文件路径。"""
+    perf = Perf()
+    perf.count("bytes", source_size(raw))
+    return parse_pages(iter_page_texts(raw, workers), catalog, perf)
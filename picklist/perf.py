@@ -0,0 +1,182 @@
+"""
+性能埋点:分阶段耗时、内存和计数,每次运行汇总成一行 JSON 日志
+
+- 耗时按阶段独占计:流式管道里各阶段交替执行,嵌套的阶段(如 normalize 拉取
+  extract 的下一页)从外层扣除
+- 内存:每个阶段进入和退出时采样进程当前 RSS,记下其中最高的(不用 ru_maxrss,
+  那是整个进程生命期的峰值,早先哪次解析冲高过,之后每个阶段都是那个数);如果进程开着 tracemalloc
+  (PYTHONTRACEMALLOC=1),另外记录该阶段内 Python 堆的峰值。默认不开,
+  tracemalloc 会让解析慢一倍左右。每份上传解析期间的 RSS 峰值由内存预算
+  (picklist.spool)采样,记在计数 rss_peak_kb 里
+- 日志写到 PICKLIST_PERF_LOG(默认 logs/perf.jsonl),同时发到 logging 的
+  picklist.perf
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+PERF_LOG = os.environ.get(
+    "PICKLIST_PERF_LOG",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs", "perf.jsonl"),
+)
+
+logger = logging.getLogger("picklist.perf")
+_log_lock = threading.Lock()
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+_PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024 if hasattr(os, "sysconf") else 4
+# (pid, /proc/self/statm 的 fd):逐阶段采样很频繁,文件一直开着,每次只 pread;fork 出的子进程关掉继承的 fd 重新打开。
+# 波次的解析线程和内存预算的采样线程会同时调用,打开时加锁,保证每个进程只开一个 fd
+_statm = None
+_statm_lock = threading.Lock()
+
+
+def _statm_fd() -> int:
+    global _statm
+    statm = _statm
+    if statm is None or statm[0] != os.getpid():
+        with _statm_lock:
+            if _statm is None or _statm[0] != os.getpid():
+                if _statm is not None:
+                    os.close(_statm[1])     # fork 继承来的父进程的 fd
+                _statm = (os.getpid(), os.open("/proc/self/statm", os.O_RDONLY))
+            statm = _statm
+    return statm[1]
+
+
+def current_rss_kb():
+    """当前 RSS(不是历史峰值);只有 Linux 能读到,其他平台返回 None。"""
+    try:
+        return int(os.pread(_statm_fd(), 64, 0).split()[1]) * _PAGE_KB
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+# 这些计数合并时取最大值,其余相加
+MAX_COUNTS = ("concurrent_parses", "rss_start_kb", "rss_peak_kb")
+
+
+class Perf:
+    """一次运行的埋点记录。不是线程安全的,每个解析 / 每次页面运行各用一个。"""
+
+    def __init__(self):
+        self.stages = {}        # 阶段名 → {"ms", "calls", "rss_kb"[, "py_peak_kb"]},rss_kb 为进出时当前 RSS 的最高值
+        self.counts = {}
+        self._stack = []
+        self._last = None
+
+    def _charge(self, now):
+        if self._stack:
+            s = self.stages[self._stack[-1]]
+            s["ms"] += (now - self._last) * 1000
+            if tracemalloc.is_tracing():
+                s["py_peak_kb"] = max(s.get("py_peak_kb", 0), tracemalloc.get_traced_memory()[1] // 1024)
+        self._last = now
+
+    def _enter(self, name):
+        self._charge(time.perf_counter())
+        self.declare(name)
+        self.stages[name]["calls"] += 1
+        self._stack.append(name)
+        self._sample_rss(name)
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+    def _exit(self):
+        self._charge(time.perf_counter())
+        self._sample_rss(self._stack.pop())
+
+    def _sample_rss(self, name):
+        rss = current_rss_kb()
+        if rss is not None:
+            s = self.stages[name]
+            s["rss_kb"] = max(s["rss_kb"] or 0, rss)
+
+    @contextmanager
+    def stage(self, name: str):
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def iter(self, name: str, iterable):
+        """逐个产出 iterable 的元素,把取下一个元素的时间记到 name 阶段。"""
+        it = iter(iterable)
+        while True:
+            self._enter(name)
+            try:
+                item = next(it)
+            except StopIteration:
+                self.stages[name]["calls"] -= 1     # calls 只计产出的元素个数
+                return
+            finally:
+                self._exit()
+            yield item
+
+    def declare(self, *names):
+        """预先登记阶段,as_dict() 里按登记顺序排列(流式管道最外层的阶段最先进入)。"""
+        for name in names:
+            self.stages.setdefault(name, {"ms": 0.0, "calls": 0, "rss_kb": None})
+
+    def count(self, key: str, n: int = 1):
+        self.counts[key] = self.counts.get(key, 0) + n
+
+    def as_dict(self) -> dict:
+        stages = {k: {**v, "ms": round(v["ms"], 2)} for k, v in self.stages.items()}
+        return {"stages": stages, "counts": dict(self.counts)}
+
+
+def merge_perf(records) -> dict:
+    """多份解析的埋点合并:各阶段耗时、计数相加,内存和同时解析数取最大。"""
+    stages, counts = {}, {}
+    for rec in records:
+        for name, s in rec.get("stages", {}).items():
+            t = stages.setdefault(name, {"ms": 0.0, "calls": 0, "rss_kb": None})
+            t["ms"] = round(t["ms"] + s["ms"], 2)
+            t["calls"] += s["calls"]
+            for k in ("rss_kb", "py_peak_kb"):
+                if s.get(k) is not None:
+                    t[k] = max(t.get(k) or 0, s[k])
+        for k, v in rec.get("counts", {}).items():
+            counts[k] = max(counts.get(k, 0), v) if k in MAX_COUNTS else counts.get(k, 0) + v
+    return {"stages": stages, "counts": counts}
+
+
+def stage_rows(record: dict, group: str) -> list:
+    """埋点 → 展示用的行 [{分组, 阶段, 耗时 ms, 次数, RSS MB}]。"""
+    return [
+        {"分组": group, "阶段": name, "耗时 ms": s["ms"], "次数": s["calls"],
+         "RSS MB": round(s["rss_kb"] / 1024, 1) if s.get("rss_kb") else None}
+        for name, s in record.get("stages", {}).items()
+    ]
+
+
+def write_perf_log(record: dict, path: str = None):
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+    logger.info(line)
+    path = path or PERF_LOG
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with _log_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        logger.warning("写性能日志失败 %s: %s", path, e)
@@ -0,0 +1,310 @@
+"""
+拣货路线:按仓库布局估算步行距离,给拣货单上的库位排出较短的走法
+
+按库位字符串排序时,拣货员每条通道都从前走到后,再走回通道口进下一条,路程差不多翻倍。
+这里按布局文件(picklist/data/warehouse_layout.json)建模:
+
+- 每个区有若干平行通道,通道两端各一个节点(front / back);有横向通道(cross_aisles)
+  的一端,相邻通道之间可以直接横穿;只有前横道的区,通道尽头是死胡同
+- 货位沿通道排开,slot_start 指 1 号货位在通道哪一端
+- connections 连接不同区的通道端点,depot 是拣货车出发 / 回收的位置
+
+布局编译时用 Floyd–Warshall 一次算好所有通道端点之间的最短距离;排路线时
+两个库位之间的距离 = 各自走到某个端点 + 端点间距离(同一通道内直接走)。
+路线:S 形(蛇形)和最近邻两种初始解,各做 2-opt 改进,取较短的一个。
+
+布局文件与 SKU 对照表一样按 mtime 热加载,改完把 version 加 1。
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+
+import numpy as np
+
+from picklist.cache import ParseCache
+from picklist.locations import LocationIndex, decode_location
+from picklist.skus import CatalogLoader
+
+LAYOUT_PATH = os.environ.get(
+    "NAILVESTA_WAREHOUSE_LAYOUT",
+    os.path.join(os.path.dirname(__file__), "data", "warehouse_layout.json"),
+)
+
+ENDS = ("front", "back")
+END_RE = re.compile(r'(?P<zone>[A-Z0-9]+(?:-[A-Z]{1,2})?)-(?P<aisle>\d{1,3})-(?P<end>FRONT|BACK)')
+# 2-opt 的时间上限(秒),到点就用当前最好的解
+TWO_OPT_BUDGET = 0.5
+
+
+@dataclass(frozen=True)
+class WarehouseLayout:
+    version: int
+    digest: str
+    unit: str
+    zones: MappingProxyType     # 区 → {aisles, slots, slot_start, cross_aisles, aisle_pitch, slot_pitch, end_margin}
+    zone_order: tuple           # 区在布局文件里的顺序(S 形路线按这个顺序逐区走)
+    node_of: MappingProxyType   # (区, 通道, 0=front / 1=back) → 节点号
+    depot_node: int
+    dist: np.ndarray            # 节点间最短距离(只读)
+
+    def depth(self, zone: str) -> float:
+        z = self.zones[zone]
+        return 2 * z["end_margin"] + (z["slots"] - 1) * z["slot_pitch"]
+
+    def zone_of(self, wh: str, zone: str):
+        if wh and f"{wh}-{zone}" in self.zones:
+            return f"{wh}-{zone}"
+        return zone if zone in self.zones else None
+
+    def place(self, loc: str):
+        """库位 → (区, 通道, 距前端的距离);布局里没有这个位置时返回 None。"""
+        key = decode_location(loc)
+        if key[0] != 0:
+            return None
+        _, wh, _, zone, aisle, slot = key
+        zone = self.zone_of(wh, zone)
+        if zone is None:
+            return None
+        z = self.zones[zone]
+        if not 1 <= aisle <= z["aisles"] or not 1 <= slot <= z["slots"]:
+            return None
+        offset = z["end_margin"] + (slot - 1) * z["slot_pitch"]
+        if z["slot_start"] == "back":
+            offset = self.depth(zone) - offset
+        return zone, aisle, offset
+
+
+def _parse_end(spec: str, zones: dict):
+    m = END_RE.fullmatch(str(spec).upper())
+    if not m or m["zone"] not in zones or not 1 <= int(m["aisle"]) <= zones[m["zone"]]["aisles"]:
+        raise ValueError(f"warehouse_layout: 无法识别的通道端点 {spec!r}(格式如 A-01-front)")
+    return m["zone"], int(m["aisle"]), ENDS.index(m["end"].lower())
+
+
+def compile_layout(data: dict, digest: str = "") -> WarehouseLayout:
+    version = data.get("version") if isinstance(data, dict) else None
+    if not isinstance(version, int):
+        raise ValueError("warehouse_layout: version 必须是整数")
+    defaults = {k: float(data.get(k, v)) for k, v in (("aisle_pitch", 3.0), ("slot_pitch", 1.0), ("end_margin", 1.5))}
+
+    zones = {}
+    for name, z in data.get("zones", {}).items():
+        z = {**defaults, "slot_start": "front", "cross_aisles": ["front", "back"], **z}
+        if int(z.get("aisles", 0)) < 1 or int(z.get("slots", 0)) < 1:
+            raise ValueError(f"warehouse_layout: 区 {name} 的 aisles / slots 必须是正整数")
+        if z["slot_start"] not in ENDS or not set(z["cross_aisles"]) <= set(ENDS):
+            raise ValueError(f"warehouse_layout: 区 {name} 的 slot_start / cross_aisles 只能是 front / back")
+        z["aisles"], z["slots"] = int(z["aisles"]), int(z["slots"])
+        zones[name.upper()] = z
+    if not zones:
+        raise ValueError("warehouse_layout: 至少要有一个区")
+
+    node_of = {}
+    for name, z in zones.items():
+        for aisle in range(1, z["aisles"] + 1):
+            for end in (0, 1):
+                node_of[(name, aisle, end)] = len(node_of)
+    depot_node = len(node_of)
+    n = depot_node + 1
+
+    dist = np.full((n, n), np.inf)
+    np.fill_diagonal(dist, 0.0)
+
+    def link(a, b, d):
+        dist[a, b] = dist[b, a] = min(dist[a, b], float(d))
+
+    for name, z in zones.items():
+        depth = 2 * z["end_margin"] + (z["slots"] - 1) * z["slot_pitch"]
+        for aisle in range(1, z["aisles"] + 1):
+            link(node_of[(name, aisle, 0)], node_of[(name, aisle, 1)], depth)
+            if aisle > 1:
+                for end in z["cross_aisles"]:
+                    e = ENDS.index(end)
+                    link(node_of[(name, aisle - 1, e)], node_of[(name, aisle, e)], z["aisle_pitch"])
+    for c in data.get("connections", ()):
+        link(node_of[_parse_end(c["from"], zones)], node_of[_parse_end(c["to"], zones)], c["distance"])
+    depot = data.get("depot") or {"at": f"{next(iter(zones))}-1-front", "distance": 0}
+    link(depot_node, node_of[_parse_end(depot["at"], zones)], depot.get("distance", 0))
+
+    for k in range(n):
+        np.minimum(dist, dist[:, k, None] + dist[None, k, :], out=dist)
+    if np.isinf(dist[depot_node]).any():
+        raise ValueError("warehouse_layout: 有通道从出发点走不到,检查 connections")
+    dist.flags.writeable = False
+
+    return WarehouseLayout(
+        version=version,
+        digest=digest,
+        unit=data.get("unit", "m"),
+        zones=MappingProxyType(zones),
+        zone_order=tuple(zones),
+        node_of=MappingProxyType(node_of),
+        depot_node=depot_node,
+        dist=dist,
+    )
+
+
+def load_layout(path: str) -> WarehouseLayout:
+    with open(path, "rb") as f:
+        raw = f.read()
+    return compile_layout(json.loads(raw), hashlib.sha256(raw).hexdigest()[:12])
+
+
+LAYOUT = CatalogLoader(LAYOUT_PATH, load=load_layout, label="仓库布局")
+
+
+def get_layout() -> WarehouseLayout:
+    return LAYOUT.get()
+
+
+# ============================================================================
+# 距离矩阵与路线
+# ============================================================================
+def distance_matrix(layout: WarehouseLayout, places) -> np.ndarray:
+    """
+    places: [(区, 通道, 距前端距离)] → (n+1)×(n+1) 距离矩阵,第 0 行 / 列是出发点。
+    整块用 numpy 广播:每对库位在两端各选一个端点,取四种组合里最短的。
+    """
+    depot = layout.depot_node
+    nodes = np.array([[depot, depot]] + [[layout.node_of[(z, a, 0)], layout.node_of[(z, a, 1)]]
+                                        for z, a, _ in places], dtype=np.int64)
+    front = np.array([0.0] + [off for _, _, off in places])
+    back = np.array([0.0] + [layout.depth(z) - off for z, _, off in places])
+    to_end = np.stack([front, back], axis=1)
+
+    d = np.full((len(nodes), len(nodes)), np.inf)
+    for e in (0, 1):
+        for f in (0, 1):
+            via = to_end[:, e, None] + layout.dist[np.ix_(nodes[:, e], nodes[:, f])] + to_end[None, :, f]
+            np.minimum(d, via, out=d)
+
+    # 同一条通道里直接走
+    aisle = np.array([-1] + [layout.node_of[(z, a, 0)] for z, a, _ in places])
+    same = (aisle[:, None] == aisle[None, :]) & (aisle[:, None] >= 0)
+    direct = np.abs(front[:, None] - front[None, :])
+    d[same] = np.minimum(d[same], direct[same])
+    np.fill_diagonal(d, 0.0)
+    return d
+
+
+def tour_length(d: np.ndarray, tour) -> float:
+    """从出发点(0)出发、按 tour 走完再回到出发点的总距离。"""
+    path = np.concatenate([[0], np.asarray(tour, dtype=np.int64), [0]])
+    return float(d[path[:-1], path[1:]].sum())
+
+
+def serpentine_order(layout: WarehouseLayout, places) -> list:
+    """S 形:按区、通道顺序逐条走,每进一条通道换一次方向。"""
+    by_aisle = {}
+    for i, (zone, aisle, off) in enumerate(places, start=1):
+        by_aisle.setdefault((layout.zone_order.index(zone), aisle), []).append((off, i))
+    tour = []
+    for k, key in enumerate(sorted(by_aisle)):
+        stops = sorted(by_aisle[key], reverse=k % 2 == 1)
+        tour.extend(i for _, i in stops)
+    return tour
+
+
+def nearest_neighbour_order(d: np.ndarray) -> list:
+    n = len(d)
+    left = np.ones(n, dtype=bool)
+    left[0] = False
+    tour, cur = [], 0
+    for _ in range(n - 1):
+        row = np.where(left, d[cur], np.inf)
+        cur = int(row.argmin())
+        left[cur] = False
+        tour.append(cur)
+    return tour
+
+
+def two_opt(d: np.ndarray, tour, budget: float = TWO_OPT_BUDGET) -> list:
+    """
+    2-opt:反转一段路线,若总距离变短就保留,直到没有改进或超时。
+    每个 i 对所有 j 的增益一次用 numpy 算出,取最好的那个。
+    """
+    t = np.concatenate([[0], np.asarray(tour, dtype=np.int64)])
+    n = len(t)
+    if n < 4:
+        return list(t[1:])
+    deadline = time.perf_counter() + budget
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(1, n - 1):
+            a, b = t[i - 1], t[i]
+            j = np.arange(i + 1, n)
+            c, nxt = t[j], t[(j + 1) % n]
+            gain = d[a, b] + d[c, nxt] - d[a, c] - d[b, nxt]
+            k = int(gain.argmax())
+            if gain[k] > 1e-9:
+                t[i:j[k] + 1] = t[i:j[k] + 1][::-1].copy()
+                improved = True
+    return list(t[1:])
+
+
+def solve_route(layout: WarehouseLayout, places, budget: float = TWO_OPT_BUDGET):
+    """places → (访问顺序(places 的下标), 距离矩阵)。"""
+    d = distance_matrix(layout, places)
+    best = None
+    for start in (serpentine_order(layout, places), nearest_neighbour_order(d)):
+        tour = two_opt(d, start, budget / 2)
+        if best is None or tour_length(d, tour) < tour_length(d, best):
+            best = tour
+    return [i - 1 for i in best], d
+
+
+@dataclass(frozen=True)
+class Route:
+    stops: tuple        # 按路线访问的库位
+    ranks: dict         # SKU 前缀 → 第几站(同一库位的前缀站号相同;缓存里的 Route 不带)
+    distance: float     # 路线步行距离(出发点 → 各库位 → 出发点)
+    baseline: float     # 同一批库位按库位字符串顺序走的距离
+    unrouted: int       # 布局里找不到、排在路线之后的库位数
+    unit: str = "m"
+
+    @property
+    def saving(self) -> float:
+        return 1 - self.distance / self.baseline if self.baseline else 0.0
+
+
+def _route_size(route: Route) -> int:
+    return 200 * len(route.stops) + 100
+
+
+ROUTE_CACHE = ParseCache(max_entries=32, max_bytes=16 * 1024 * 1024, sizeof=_route_size)
+
+
+def plan_route(prefixes, index: LocationIndex, layout: WarehouseLayout) -> Route:
+    """
+    拣货表上的 SKU 前缀 → Route。没有库位的前缀不进路线;布局里找不到的库位
+    计入 unrouted,由排序按库位字符串顺序排在路线之后。
+    相同的库位集合(重跑页面、切换显示方式)直接用缓存。
+    """
+    by_loc = {}
+    for prefix in prefixes:
+        loc = index.location(prefix)
+        if loc is not None:
+            by_loc.setdefault(loc, []).append(prefix)
+    locs = sorted(by_loc, key=decode_location)
+    key = layout.digest + ":" + hashlib.sha256("\n".join(locs).encode()).hexdigest()
+    route = ROUTE_CACHE.get_or_compute(key, lambda: _plan(locs, layout))
+    return replace(route, ranks={p: i for i, loc in enumerate(route.stops) for p in by_loc[loc]})
+
+
+def _plan(locs, layout: WarehouseLayout) -> Route:
+    routable = [(loc, layout.place(loc)) for loc in locs]
+    routable = [(loc, p) for loc, p in routable if p is not None]
+    if not routable:
+        return Route((), {}, 0.0, 0.0, len(locs), layout.unit)
+    places = [p for _, p in routable]
+    order, d = solve_route(layout, places)
+    stops = tuple(routable[i][0] for i in order)
+    # routable 保持 locs 的库位字符串顺序,就是原来"按库位"的走法
+    baseline = tour_length(d, range(1, len(places) + 1))
+    return Route(stops, {}, tour_length(d, [i + 1 for i in order]), baseline, len(locs) - len(routable), layout.unit)
@@ -0,0 +1,328 @@
+"""
+本地解析服务:面单打印、打包台看板等工具通过 HTTP 上传拣货 PDF,拿到 JSON 格式的计数和对账结果,
+不用再抓 Streamlit 页面或自己抄一份正则
+
+    python -m picklist.service [--port 8765] [--workers 2] [--queue 8]
+
+只监听 127.0.0.1。接口:
+- POST /parse?mode=text|layout&name=文件名[&wait=0]
+    请求体为 PDF 字节,或 multipart 表单的 file 字段。默认等解析完:成功 200、解析失败 422;
+    等待超过 WAIT_SECONDS 或 wait=0 时立即返回 202,Location 为任务地址
+- GET /jobs/<id>:任务状态(queued / running / done / failed),完成后带结果
+- GET /health:进程数、排队 / 解析中的任务数、平均解析耗时
+请求体超过 --max-upload-mb 时连接直接被断开(400)。
+
+- 前端是 tornado 的异步服务,解析在进程池里跑(workers 个进程,spawn);任务先进有界队列,
+  由 workers 个调度协程取出交给进程池
+- 队列满时直接回 429,Retry-After 按平均解析耗时估算排到的时间
+- 同一份 PDF(内容哈希 + 模式 + 对照表)正在排队 / 解析 / 解析过时不再解析,返回同一个任务
+  (deduplicated: true);已结束的任务保留最近 JOB_HISTORY 个,解析失败的再上传时重新解析
+- 入队的上传先落盘(picklist.spool),落盘后请求里的字节随即丢掉,排队期间不占内存;
+  子进程按路径打开,解析完删除。算哈希和落盘在线程池里做,不堵事件循环。
+  结果里的 memory 为子进程解析期间的 RSS(解析前 / 峰值)
+"""
+
+import argparse
+import asyncio
+import hashlib
+import math
+import multiprocessing
+import os
+import signal
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import tornado.web
+
+from picklist.cache import PARSERS, content_hash, parse_key
+from picklist.extract import available_cpus
+from picklist.parser import ParseResult
+from picklist.skus import SkuCatalog, get_catalog
+from picklist.spool import MEMORY_BUDGET, spool
+
+PORT = int(os.environ.get("PICKLIST_SERVICE_PORT", "8765"))
+HOST = "127.0.0.1"
+MAX_UPLOAD_MB = 64
+# POST /parse 默认最多等这么久,之后返回 202 让调用方轮询
+WAIT_SECONDS = 30
+JOB_HISTORY = 256
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def result_json(result: ParseResult, catalog: SkuCatalog) -> dict:
+    return {
+        "sku_counts": result.sku_counts,
+        "b_chain_counts": result.b_chain_counts,
+        "expected_total": result.expected_total,
+        "bundle_extra": result.bundle_extra,
+        "mystery_units": result.mystery_units,
+        "binder_units": result.binder_units,
+        "choose_sets_units": result.choose_sets_units,
+        "total_qty": result.total_qty,
+        "expected_with_bundle": result.expected_with_bundle,
+        "reconciliation": result.reconciliation,
+        "pages": result.perf.get("counts", {}).get("pages"),
+        "catalog_version": catalog.version,
+    }
+
+
+def _parse_job(path: str, mode: str) -> dict:
+    # 子进程内整份串行解析;对照表由子进程自己加载(改了文件自动重载)。
+    # 子进程一次只解析一份,预留不会排队,只用来采样 RSS
+    catalog = get_catalog()
+    with MEMORY_BUDGET.reserve(0) as reservation:
+        out = result_json(PARSERS[mode](path, workers=1, catalog=catalog), catalog)
+    out["memory"] = {k: v for k, v in reservation.counts().items() if k.startswith("rss_")}
+    return out
+
+
+class Job:
+    def __init__(self, job_id: str, name: str, digest: str, mode: str):
+        self.id = job_id
+        self.name = name
+        self.digest = digest
+        self.mode = mode
+        self.status = QUEUED
+        self.result = None
+        self.error = ""
+        self.submitted = time.time()
+        self.seconds = None         # 解析耗时(不含排队)
+        self.finished = asyncio.Event()
+
+    def as_json(self) -> dict:
+        out = {"id": self.id, "status": self.status, "name": self.name, "digest": self.digest, "mode": self.mode}
+        if self.seconds is not None:
+            out["parse_ms"] = round(self.seconds * 1000, 1)
+        if self.status == DONE:
+            out["result"] = self.result
+        elif self.status == FAILED:
+            out["error"] = self.error
+        return out
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class ParseService:
+    """有界队列 + 进程池;submit() 是协程,在事件循环里调用。"""
+
+    def __init__(self, workers: int = None, queue_size: int = None):
+        self.workers = workers or available_cpus()
+        self.queue_size = max(1, queue_size or 4 * self.workers)
+        self.jobs = OrderedDict()   # id → Job,已结束的按 LRU 淘汰
+        self.running = 0
+        self.spooling = 0           # 已占了队列位置、还在落盘的任务
+        self.avg_seconds = 1.0      # 解析耗时的指数滑动平均,用来估算 Retry-After
+        self.parsed = self.deduplicated = self.rejected = 0
+        self.pool = None
+        self.queue = None
+        self._tasks = []
+
+    def start(self):
+        self.pool = self._new_pool()
+        self.queue = asyncio.Queue(self.queue_size)
+        self._tasks = [asyncio.ensure_future(self._dispatch()) for _ in range(self.workers)]
+
+    def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        while self.queue is not None and not self.queue.empty():
+            self.queue.get_nowait()[1].close()     # 还没解析的落盘文件
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def retry_after(self) -> int:
+        backlog = self.queue.qsize() + self.spooling + self.running
+        return max(1, math.ceil(self.avg_seconds * backlog / self.workers))
+
+    async def submit(self, raw: bytes, name: str, mode: str) -> tuple:
+        """→ (Job, 是否复用了已有任务)。队列满时抛 QueueFull。"""
+        loop = asyncio.get_running_loop()
+        digest = await loop.run_in_executor(None, content_hash, raw)
+        job_id = hashlib.sha256(parse_key(digest, mode, get_catalog()).encode()).hexdigest()[:16]
+        job = self.jobs.get(job_id)
+        if job is not None and job.status != FAILED:
+            self.jobs.move_to_end(job_id)
+            self.deduplicated += 1
+            return job, True
+        if self.queue.qsize() + self.spooling >= self.queue_size:
+            self.rejected += 1
+            raise QueueFull(self.retry_after())
+        # 先登记任务、占住队列位置再落盘,落盘期间同一份文件再提交进来时复用这个任务
+        job = Job(job_id, name, digest, mode)
+        self.jobs[job_id] = job
+        self.jobs.move_to_end(job_id)
+        self.spooling += 1
+        try:
+            spooled = await loop.run_in_executor(None, spool, raw, name, digest)
+        except Exception as e:
+            job.status, job.error = FAILED, f"{type(e).__name__}: {e}"
+            job.finished.set()
+            raise
+        finally:
+            self.spooling -= 1
+        self.queue.put_nowait((job, spooled))
+        return job, False
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job, spooled = await self.queue.get()
+            job.status = RUNNING
+            self.running += 1
+            t0 = time.perf_counter()
+            try:
+                job.result = await loop.run_in_executor(self.pool, _parse_job, spooled.path, job.mode)
+                job.status = DONE
+                self.parsed += 1
+            except Exception as e:
+                job.status, job.error = FAILED, f"{type(e).__name__}: {e}"
+                if isinstance(e, BrokenProcessPool):
+                    # 子进程被杀(内存不足等)后进程池不能再用,换一个
+                    self.pool.shutdown(wait=False)
+                    self.pool = self._new_pool()
+            finally:
+                job.seconds = time.perf_counter() - t0
+                self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * job.seconds
+                self.running -= 1
+                spooled.close()
+                job.finished.set()
+                self._evict()
+
+    def _evict(self):
+        finished = [j for j in self.jobs.values() if j.status in (DONE, FAILED)]
+        for job in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self.jobs[job.id]
+
+    def health(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queued": self.queue.qsize(),
+            "running": self.running,
+            "avg_parse_ms": round(self.avg_seconds * 1000, 1),
+            "parsed": self.parsed,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "catalog_version": get_catalog().version,
+        }
+
+
+# ============================================================================
+# HTTP
+# ============================================================================
+class JsonHandler(tornado.web.RequestHandler):
+    def initialize(self, service: ParseService):
+        self.service = service
+
+    def reply(self, status: int, body: dict):
+        self.set_status(status)
+        self.finish(body)
+
+    def write_error(self, status_code, **kwargs):
+        self.finish({"error": self._reason})
+
+
+class ParseHandler(JsonHandler):
+    async def post(self):
+        mode = self.get_query_argument("mode", "text")
+        if mode not in PARSERS:
+            return self.reply(400, {"error": f"mode 只能是 {' / '.join(sorted(PARSERS))}"})
+        files = self.request.files.get("file")
+        if files:
+            raw, name = files[0]["body"], files[0]["filename"]
+        else:
+            raw, name = self.request.body, ""
+        name = self.get_query_argument("name", name)
+        if b"%PDF" not in raw[:1024]:
+            return self.reply(400, {"error": "请求体不是 PDF"})
+
+        try:
+            job, reused = await self.service.submit(raw, name, mode)
+        except QueueFull as e:
+            self.set_header("Retry-After", str(e.retry_after))
+            return self.reply(429, {"error": "解析队列已满,请稍后重试", "retry_after": e.retry_after})
+        finally:
+            # 已经落盘(或被拒),等解析结果期间不再留着上传的字节
+            del raw, files
+            self.request.body, self.request.files = b"", {}
+
+        self.set_header("Location", f"/jobs/{job.id}")
+        if self.get_query_argument("wait", "1") != "0":
+            try:
+                await asyncio.wait_for(job.finished.wait(), WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        status = {DONE: 200, FAILED: 422}.get(job.status, 202)
+        self.reply(status, dict(job.as_json(), deduplicated=reused))
+
+
+class JobHandler(JsonHandler):
+    def get(self, job_id):
+        job = self.service.jobs.get(job_id)
+        if job is None:
+            return self.reply(404, {"error": "没有这个任务(可能已过期)"})
+        self.reply(200, job.as_json())
+
+
+class HealthHandler(JsonHandler):
+    def get(self):
+        self.reply(200, self.service.health())
+
+
+class NotFoundHandler(JsonHandler):
+    def prepare(self):
+        raise tornado.web.HTTPError(404)
+
+
+def make_app(service: ParseService) -> tornado.web.Application:
+    args = {"service": service}
+    return tornado.web.Application([
+        (r"/parse", ParseHandler, args),
+        (r"/jobs/([0-9a-f]+)", JobHandler, args),
+        (r"/health", HealthHandler, args),
+    ], default_handler_class=NotFoundHandler, default_handler_args=args)
+
+
+async def serve(port: int = PORT, workers: int = None, queue_size: int = None, max_upload_mb: int = MAX_UPLOAD_MB):
+    service = ParseService(workers, queue_size)
+    service.start()
+    server = make_app(service).listen(port, address=HOST, max_body_size=max_upload_mb * 1024 * 1024)
+    print(f"拣货单解析服务 http://{HOST}:{port} · {service.workers} 个解析进程 · 队列 {service.queue_size}",
+          flush=True)
+    stopped = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):     # Windows 上没有 add_signal_handler,只能 Ctrl+C
+            asyncio.get_running_loop().add_signal_handler(sig, stopped.set)
+    try:
+        await stopped.wait()
+    finally:
+        server.stop()
+        service.stop()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m picklist.service", description="本地拣货单解析服务(只监听 127.0.0.1)")
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--workers", type=int, help="解析进程数(默认 CPU 核数)")
+    ap.add_argument("--queue", type=int, help="排队上限,超过回 429(默认 4 × 进程数)")
+    ap.add_argument("--max-upload-mb", type=int, default=MAX_UPLOAD_MB)
+    args = ap.parse_args(argv)
+    try:
+        asyncio.run(serve(args.port, args.workers, args.queue, args.max_upload_mb))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+SKU 对照表(数据文件 picklist/data/sku_catalog.json)
+
+⚠️ 有新款上架时只改数据文件,不用改代码、不用重启:
+- 新增甲片款式 → products 加一行
+- 新增近期新款 → new 加一项(用于标记"新款")
+- 新增无尺寸 SKU → products + sizeless
+- 新增 B链产品 → b_chain 加一行
+- 改完把 version 加 1
+
+每个进程只编译一次:字典冻结成只读视图,同时预先算好反查表(款式名 → 前缀)、
+B链正则和前缀字典树(PrefixTrie)。每次 get_catalog() 只 stat 一下文件,mtime 变了才重新编译;
+新文件有错时继续用上一版,并在 CatalogLoader.error 里记下原因。
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+
+CATALOG_PATH = os.environ.get(
+    "NAILVESTA_SKU_CATALOG",
+    os.path.join(os.path.dirname(__file__), "data", "sku_catalog.json"),
+)
+
+PREFIX_RE = re.compile(r'[A-Z]{2,3}\d{3}|[A-Z]+')
+# 一个 bundle 最多由几段前缀拼成
+MAX_BUNDLE_PARTS = 4
+_UPPER = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+_DIGITS = frozenset("0123456789")
+
+
+def is_regular_prefix(code: str, i: int = 0) -> bool:
+    """code[i:i+6] 是否为常规前缀格式(3 个大写字母 + 3 位数字,如 NOF003)。"""
+    return (len(code) >= i + 6 and code[i] in _UPPER and code[i + 1] in _UPPER and code[i + 2] in _UPPER
+            and code[i + 3] in _DIGITS and code[i + 4] in _DIGITS and code[i + 5] in _DIGITS)
+
+
+class PrefixTrie:
+    """
+    对照表里所有前缀(款式 + B链)编成的字典树,用来拆 bundle 编码和给未识别前缀找近似。
+
+    - split():把 NOF003NM001NPX014 这样连写的编码一次拆成各段。每个位置沿字典树走一遍,
+      得到所有以此处开头的已知前缀;再加上常规格式(对照表里还没有的新款也照常拆开)。
+      长的优先,拆不完时回退。结果按编码缓存
+    - irregular:不是常规格式的已知前缀(NM001、NF001、AUCTION 这类),解析正则把它们
+      也当作 bundle 的一段,新增这类前缀不用改解析代码
+    """
+
+    def __init__(self, codes):
+        self.codes = frozenset(codes)
+        self.irregular = frozenset(c for c in self.codes if not (len(c) == 6 and is_regular_prefix(c)))
+        self.root = {}
+        for code in self.codes:
+            node = self.root
+            for ch in code:
+                node = node.setdefault(ch, {})
+            node[""] = code             # 空串键标记一个完整前缀
+        self.split = lru_cache(maxsize=65536)(self._split)
+
+    def __contains__(self, code) -> bool:
+        return code in self.codes
+
+    def prefixes_at(self, code: str, i: int) -> list:
+        """以 code[i] 开头的已知前缀的结束位置,从长到短。"""
+        ends, node = [], self.root
+        for j in range(i, len(code)):
+            node = node.get(code[j])
+            if node is None:
+                break
+            if "" in node:
+                ends.append(j + 1)
+        return ends[::-1]
+
+    def _split(self, code: str):
+        """bundle 编码(不含尺码)→ 各段前缀的 tuple;拆不成 1~MAX_BUNDLE_PARTS 段时为 None。"""
+        def walk(i, depth):
+            if i == len(code):
+                return ()
+            if depth == MAX_BUNDLE_PARTS:
+                return None
+            ends = self.prefixes_at(code, i)
+            if i + 6 not in ends and is_regular_prefix(code, i):
+                ends.append(i + 6)
+                ends.sort(reverse=True)
+            for end in ends:
+                rest = walk(end, depth + 1)
+                if rest is not None:
+                    return (code[i:end],) + rest
+            return None
+
+        return walk(0, 0) or None
+
+    def suggest(self, prefix: str, n: int = 3) -> list:
+        """
+        与未识别前缀最接近的已知前缀,最多 n 个:编辑距离不超过 2(短前缀为 1),
+        按编辑距离、共同开头的长度、字母顺序排。
+        """
+        limit = 1 if len(prefix) <= 4 else 2
+        scored = []
+        for code in self.codes:
+            if abs(len(code) - len(prefix)) > limit:
+                continue
+            d = _edit_distance(prefix, code)
+            if d <= limit:
+                shared = next((k for k, (a, b) in enumerate(zip(prefix, code)) if a != b), min(len(prefix), len(code)))
+                scored.append((d, -shared, code))
+        return [code for *_, code in sorted(scored)[:n]]
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """增 / 删 / 改 / 相邻两字符对调 各算 1 步(NPX104 与 NPX014 相差 1)。"""
+    before, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i]
+        for j in range(1, len(b) + 1):
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d = min(d, before[j - 2] + 1)
+            cur.append(d)
+        before, prev = prev, cur
+    return prev[-1]
+
+
+@dataclass(frozen=True)
+class SkuCatalog:
+    version: int
+    digest: str                 # 文件内容 sha256 前 12 位,解析缓存按它区分不同版本的对照表
+    names: MappingProxyType     # 前缀 → 款式名
+    prefix_by_name: MappingProxyType  # 款式名 → 前缀(同名时取文件中靠后的)
+    new_prefixes: frozenset
+    sizeless: frozenset
+    b_chain_names: MappingProxyType   # B链编码 → 展示名
+    b_chain_codes: frozenset
+    b_chain_re: re.Pattern
+    prefixes: PrefixTrie
+
+
+def compile_catalog(data: dict, digest: str = "") -> SkuCatalog:
+    version = data.get("version") if isinstance(data, dict) else None
+    if not isinstance(version, int):
+        raise ValueError("sku_catalog: version 必须是整数")
+    names = data.get("products", {})
+    b_chain = data.get("b_chain", {})
+    for code in list(names) + list(b_chain):
+        if not PREFIX_RE.fullmatch(code):
+            raise ValueError(f"sku_catalog: 非法的 SKU 前缀 {code!r}")
+
+    # 长编码在前,保证交替分支不会先命中较短的前缀
+    codes = sorted(b_chain, key=lambda c: (-len(c), c))
+    return SkuCatalog(
+        version=version,
+        digest=digest,
+        names=MappingProxyType(dict(names)),
+        prefix_by_name=MappingProxyType({name: prefix for prefix, name in names.items()}),
+        new_prefixes=frozenset(data.get("new", ())),
+        sizeless=frozenset(data.get("sizeless", ())),
+        b_chain_names=MappingProxyType(dict(b_chain)),
+        b_chain_codes=frozenset(codes),
+        b_chain_re=re.compile(r'\b(' + '|'.join(codes) + r')\b') if codes else re.compile(r'(?!)'),
+        prefixes=PrefixTrie(list(names) + codes),
+    )
+
+
+def load_catalog(path: str) -> SkuCatalog:
+    with open(path, "rb") as f:
+        raw = f.read()
+    return compile_catalog(json.loads(raw), hashlib.sha256(raw).hexdigest()[:12])
+
+
+class CatalogLoader:
+    """按文件 mtime 热加载的对照表,线程安全。load / label 可换成别的带 version 的数据文件(如仓库布局)。"""
+
+    def __init__(self, path: str, load=load_catalog, label: str = "SKU 对照表"):
+        self.path = path
+        self.load = load
+        self.label = label
+        self.error = None
+        self._catalog = None
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _file_stamp(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def get(self) -> SkuCatalog:
+        try:
+            stamp = self._file_stamp()
+        except OSError as e:
+            if self._catalog is None:
+                raise
+            self.error = f"读取{self.label}失败,继续使用 v{self._catalog.version}:{e}"
+            return self._catalog
+        if stamp == self._stamp:
+            return self._catalog
+
+        with self._lock:
+            if stamp != self._stamp:
+                try:
+                    catalog = self.load(self.path)
+                except (OSError, ValueError) as e:
+                    if self._catalog is None:
+                        raise
+                    self.error = f"{self.label}有误,继续使用 v{self._catalog.version}:{e}"
+                else:
+                    self._catalog, self.error = catalog, None
+                # 出错时也记下 stamp,文件没再改动就不反复重试
+                self._stamp = stamp
+        return self._catalog
+
+
+CATALOG = CatalogLoader(CATALOG_PATH)
+
+
+def get_catalog() -> SkuCatalog:
+    return CATALOG.get()
+
+
+def unknown_prefixes(skus, catalog: SkuCatalog) -> dict:
+    """
+    sku_counts 的键里对照表没有的前缀 → 最接近的已知前缀列表,按首次出现的顺序。
+    Choose Sets 的汇总键不算。
+    """
+    out = {}
+    for sku in skus:
+        prefix = sku.split("-")[0]
+        if prefix not in catalog.names and prefix != "__CHOOSE_SETS__" and prefix not in out:
+            out[prefix] = catalog.prefixes.suggest(prefix)
+    return out
@@ -0,0 +1,178 @@
+"""
+上传落盘与每进程内存预算
+
+几个人同时上传大 PDF 时,不让每份上传的字节、MuPDF 文档和提取出的文字同时压在一个进程里:
+- spool():上传分块写进 SPOOL_DIR 下的临时文件,边写边算内容哈希;解析按路径打开,
+  MuPDF 按需读取,进程池的子进程也直接打开同一个文件
+- MemoryBudget:解析前按文件大小估算要用的内存并预留,预留总量会超过预算时按到达顺序排队,
+  等前面的解析结束再开始。单份就超过预算的文件等到没有其他解析时单独放行
+- 每次预留记下排队时间和开始时同时在解析的份数,解析期间每 SAMPLE_SECONDS 采样一次进程 RSS,
+  写进这次解析的埋点计数(memory_wait_ms / concurrent_parses / rss_start_kb / rss_peak_kb)
+
+预算:PICKLIST_MEMORY_BUDGET_MB(默认 1024);临时目录:PICKLIST_SPOOL_DIR(默认系统临时目录)。
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, suppress
+
+from picklist.perf import current_rss_kb
+
+SPOOL_DIR = os.environ.get("PICKLIST_SPOOL_DIR") or None
+MEMORY_BUDGET_MB = int(os.environ.get("PICKLIST_MEMORY_BUDGET_MB", "1024"))
+# 合成拣货单实测:流式解析和增量解析(逐页处理)的内存峰值都在文件大小的 2~3.5 倍
+PARSE_MEMORY_FACTOR = 4
+PARSE_MEMORY_BASE = 8 * 1024 * 1024
+CHUNK = 1024 * 1024
+SAMPLE_SECONDS = 0.02
+
+
+def _chunks(src):
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        yield src
+        return
+    src.seek(0)
+    try:
+        yield from iter(lambda: src.read(CHUNK), b"")
+    finally:
+        src.seek(0)
+
+
+def hash_stream(src) -> str:
+    """字节或二进制文件对象的内容哈希(与 cache.content_hash 相同),文件对象分块读、不整份复制。"""
+    h = hashlib.sha256()
+    for chunk in _chunks(src):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+class SpooledPdf:
+    """落盘的上传文件;用完 close()(或 with)删除。"""
+
+    def __init__(self, path: str, name: str, size: int, digest: str):
+        self.path = path
+        self.name = name
+        self.size = size
+        self.digest = digest
+
+    def close(self):
+        with suppress(FileNotFoundError):
+            os.unlink(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def spool(src, name: str = "", digest: str = None) -> SpooledPdf:
+    """字节或二进制文件对象 → SpooledPdf。调用方已经算过内容哈希时传 digest,不再算一遍。"""
+    fd, path = tempfile.mkstemp(suffix=".pdf", prefix="picklist-", dir=SPOOL_DIR)
+    h, size = (None if digest else hashlib.sha256()), 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in _chunks(src):
+                if h is not None:
+                    h.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return SpooledPdf(path, name, size, digest or h.hexdigest())
+
+
+# ============================================================================
+# 内存预算
+# ============================================================================
+class Reservation:
+    """一次预留;解析期间的 RSS 峰值由采样线程更新。"""
+
+    def __init__(self, nbytes: int, waited: float, concurrent: int):
+        self.nbytes = nbytes
+        self.waited = waited
+        self.concurrent = concurrent
+        self.rss_start = current_rss_kb()
+        self.rss_peak = self.rss_start
+
+    def sample(self, rss):
+        if rss is not None and self.rss_peak is not None:
+            self.rss_peak = max(self.rss_peak, rss)
+
+    def counts(self, rss: bool = True) -> dict:
+        out = {"memory_wait_ms": round(self.waited * 1000), "concurrent_parses": self.concurrent}
+        if rss and self.rss_start is not None:
+            out.update(rss_start_kb=self.rss_start, rss_peak_kb=self.rss_peak)
+        return out
+
+    def annotate(self, perf: dict, rss: bool = True) -> dict:
+        """
+        把预留的计数并进一次解析的埋点(ParseResult.perf)。
+        解析在子进程里跑时传 rss=False,保留子进程自己采样、随埋点带回的 RSS。
+        """
+        return {**perf, "counts": {**perf.get("counts", {}), **self.counts(rss)}}
+
+
+class MemoryBudget:
+    def __init__(self, budget_bytes: int):
+        self.budget = budget_bytes
+        self.reserved = 0
+        self.active = []
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._sampler = None
+
+    @staticmethod
+    def estimate(size: int) -> int:
+        return PARSE_MEMORY_BASE + PARSE_MEMORY_FACTOR * size
+
+    @property
+    def waiting(self) -> int:
+        return len(self._queue)
+
+    @contextmanager
+    def reserve(self, nbytes: int):
+        t0 = time.perf_counter()
+        ticket = object()
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                self._cond.wait_for(lambda: self._queue[0] is ticket
+                                    and (not self.active or self.reserved + nbytes <= self.budget))
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+            r = Reservation(nbytes, time.perf_counter() - t0, len(self.active) + 1)
+            self.reserved += nbytes
+            self.active.append(r)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample, name="picklist-rss", daemon=True)
+                self._sampler.start()
+        try:
+            yield r
+        finally:
+            r.sample(current_rss_kb())
+            with self._cond:
+                self.active.remove(r)
+                self.reserved -= nbytes
+                self._cond.notify_all()
+
+    def _sample(self):
+        while True:
+            with self._cond:
+                if not self.active:
+                    self._sampler = None
+                    return
+                active = list(self.active)
+            rss = current_rss_kb()
+            for r in active:
+                r.sample(rss)
+            time.sleep(SAMPLE_SECONDS)
+
+
+MEMORY_BUDGET = MemoryBudget(MEMORY_BUDGET_MB * 1024 * 1024)
@@ -0,0 +1,175 @@
+"""
+拣货明细表:SKU 计数 → 按款式汇总的 S / M / L 表,排序、标色
+
+全部按整列运算:一次性拆分 SKU、一次 groupby + unstack 透视、无尺寸款一次 concat、
+库位和款式名整列 map,排序用图册加载时预先算好的整数名次,标色用布尔掩码。
+"""
+
+import numpy as np
+import pandas as pd
+
+from picklist.locations import EMPTY_INDEX, LocationIndex, decode_locations
+from picklist.skus import SkuCatalog
+
+CHOOSE_SETS_KEY = "__CHOOSE_SETS__"
+CHOOSE_SETS_NAME = "Choose 2 Sets(混合套装)"
+UNKNOWN_NAME = "❓未识别"
+SPECIAL_LOCATION = "无库位(特殊款)"
+MISSING_LOCATION = "未识别库位"
+
+SIZES = ["S", "M", "L"]
+COLUMNS = ["库位", "Product Name", "S", "M", "L", "Total"]
+
+# 行状态 → 背景色
+STATUS_NEW = "new"
+STATUS_MISSING = "missing"
+STATUS_SPECIAL = "special"
+STATUS_COLORS = {
+    STATUS_MISSING: "#fef5e7",
+    STATUS_SPECIAL: "#f5f0f5",
+    STATUS_NEW: "#fff0f5",
+}
+STATUS_LABELS = {
+    STATUS_MISSING: "🟡 缺库位",
+    STATUS_SPECIAL: "⚫ 特殊款",
+    STATUS_NEW: "🌸 新款",
+}
+NO_SECTION = "未定位"
+# 轻量展示每页行数
+PAGE_SIZE = 50
+
+
+def build_pivot(sku_counts: dict, catalog: SkuCatalog, index: LocationIndex = EMPTY_INDEX) -> pd.DataFrame:
+    """
+    sku_counts → 列为 Product Name / SKU Prefix / S / M / L / Total / 库位 的汇总表。
+    带尺码的 SKU 按款式透视,无尺寸 SKU(NF001、Choose Sets 等)各占一行排在后面。
+    """
+    # 拆前缀 / 尺码用 str.partition 一遍列表推导;Series.str.split(expand=True) 逐行构造,
+    # 占了整张表一半以上的时间
+    parts = [sku.partition("-") for sku in sku_counts]
+    prefix = pd.Series([p for p, _, _ in parts], dtype=object)
+    size = pd.Series([s if sep else None for _, sep, s in parts], dtype=object)
+    qty = pd.Series(list(sku_counts.values()), dtype="int64")
+
+    # 款式名只取决于前缀,透视时只按 (前缀, 尺码) 分组,最后再整列 map
+    sized = size.notna()
+    pivot = (
+        pd.DataFrame({"SKU Prefix": prefix[sized], "Size": size[sized], "Qty": qty[sized]})
+        .groupby(["SKU Prefix", "Size"])["Qty"].sum()
+        .unstack("Size", fill_value=0)
+        .reindex(columns=SIZES, fill_value=0)
+        .reset_index()
+    )
+    pivot.columns.name = None
+    pivot["Total"] = pivot["S"] + pivot["M"] + pivot["L"]
+
+    nosized = pd.DataFrame({"SKU Prefix": prefix[~sized], "S": 0, "M": 0, "L": 0, "Total": qty[~sized]})
+    pivot = pd.concat([pivot, nosized], ignore_index=True)
+
+    prefix = pivot["SKU Prefix"]
+    name = prefix.map(catalog.names).fillna(UNKNOWN_NAME)
+    name[prefix == CHOOSE_SETS_KEY] = CHOOSE_SETS_NAME
+    pivot.insert(0, "Product Name", name)
+
+    special = pivot["SKU Prefix"].isin(catalog.sizeless | {CHOOSE_SETS_KEY})
+    pivot["库位"] = pivot["SKU Prefix"].map(index.locations).fillna(MISSING_LOCATION)
+    pivot.loc[special, "库位"] = SPECIAL_LOCATION
+    return pivot
+
+
+def sort_pivot(pivot: pd.DataFrame, catalog: SkuCatalog, index: LocationIndex = EMPTY_INDEX,
+               by_location: bool = True, route=None):
+    """
+    排序并去掉辅助列 → (展示用的表, 每行状态)。
+    特殊款总在最后;按库位时同库位再按款式名,按字母时按款式名(不区分大小写)。
+    给了 route(picklist.route.Route)时按路线站号排,不在路线上的库位按库位顺序排在后面。
+    """
+    prefix = pivot["SKU Prefix"]
+    special = prefix.isin(catalog.sizeless | {CHOOSE_SETS_KEY})
+    keys = pd.DataFrame({"_special": special.astype("int8")}, index=pivot.index)
+    if by_location:
+        rank = prefix.map(index.ranks).fillna(index.missing_rank).astype("int64")
+        rank = rank.mask(special, index.unparsed_rank)
+        if route is not None:
+            rank = prefix.map(route.ranks).fillna(rank + len(route.stops)).astype("int64").mask(
+                special, rank + len(route.stops))
+        keys["_rank"] = rank
+        keys["_name"] = pivot["Product Name"]
+    else:
+        keys["_name"] = pivot["Product Name"].str.lower()
+    order = keys.sort_values(list(keys.columns), kind="stable").index
+
+    loc = pivot["库位"]
+    status = np.select(
+        [(loc == MISSING_LOCATION).to_numpy(), (loc == SPECIAL_LOCATION).to_numpy(),
+         prefix.isin(catalog.new_prefixes).to_numpy()],
+        [STATUS_MISSING, STATUS_SPECIAL, STATUS_NEW],
+        default="",
+    )
+    table = pivot.loc[order, COLUMNS].reset_index(drop=True)
+    return table, pd.Series(status, index=pivot.index)[order].reset_index(drop=True)
+
+
+def style_pick_table(table: pd.DataFrame, status: pd.Series):
+    """按行状态整表生成背景色(Styler.apply(axis=None),不逐行回调)。"""
+    css = status.map({"": "", **{s: f"background-color: {c}" for s, c in STATUS_COLORS.items()}}).to_numpy()
+
+    def _styles(df):
+        return pd.DataFrame(np.repeat(css[:, None], df.shape[1], axis=1), index=df.index, columns=df.columns)
+
+    return table.style.apply(_styles, axis=None)
+
+
+# ============================================================================
+# 轻量展示(手持终端):不带样式,状态用一列表示,按区段筛选 + 分页
+# ============================================================================
+def section_labels(table: pd.DataFrame) -> pd.Series:
+    """每行所在区段(仓库 + 区 + 通道,如 "A-03"、"WH2 B-12");没有库位或格式无法识别为 NO_SECTION。"""
+    labels = {}
+    for loc in table["库位"].unique():
+        key = decode_locations([loc])[0]
+        if key[0] == 0:
+            _, wh, _, zone, aisle, _ = key
+            labels[loc] = f"{wh} {zone}-{aisle:02d}" if wh else f"{zone}-{aisle:02d}"
+        else:
+            labels[loc] = NO_SECTION
+    return table["库位"].map(labels)
+
+
+def compact_table(table: pd.DataFrame, status: pd.Series) -> pd.DataFrame:
+    """状态列(分类类型)+ 原表,数量列压成 int32,直接以 Arrow 发送,没有逐格 CSS。"""
+    compact = table.astype({c: "int32" for c in SIZES + ["Total"]})
+    labels = status.map(STATUS_LABELS).fillna("")
+    compact.insert(0, "状态", pd.Categorical(labels, categories=["", *STATUS_LABELS.values()]))
+    return compact
+
+
+def page_slice(df: pd.DataFrame, page: int, page_size: int) -> pd.DataFrame:
+    start = (page - 1) * page_size
+    return df.iloc[start:start + page_size]
+
+
+# ============================================================================
+# 导出
+# ============================================================================
+def b_chain_summary(b_chain_counts: dict, catalog: SkuCatalog) -> dict:
+    """B链编码计数 → {产品名: 件数}(同名的编码合并)。"""
+    out = {}
+    for code, qty in b_chain_counts.items():
+        name = catalog.b_chain_names[code]
+        out[name] = out.get(name, 0) + qty
+    return out
+
+
+def pick_table_csv(table: pd.DataFrame, b_chain: dict = None) -> bytes:
+    """拣货明细表 → CSV(utf-8-sig,Excel 直接打开);有 B链产品时空一行,另起一段列在表后。"""
+    if b_chain:
+        cols = table.columns.tolist()
+        blank = [""] * (len(cols) - 1)
+        tail = pd.DataFrame(
+            [[""] + blank, ["─── B链产品 ───"] + blank]
+            + [[name] + blank[:-1] + [qty] for name, qty in sorted(b_chain.items())],
+            columns=cols,
+        )
+        table = pd.concat([table, tail], ignore_index=True)
+    return table.to_csv(index=False).encode("utf-8-sig")
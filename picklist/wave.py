@@ -0,0 +1,205 @@
+"""
+波次模式:一次上传多份拣货 PDF,并发解析后合并成一张拣货表
+
+- 每份文件单独走解析缓存,内容相同的文件只算一次(重复上传的标记出来,不重复计数)
+- 文本模式走按页缓存的增量解析(picklist.incremental):在本进程解析才能复用页缓存,
+  只把没见过的页交给进程池提取
+- 版面模式多核时每份文件交给进程池整份解析;单核或只有一份文件时在本进程解析
+- 每份文件单独对账;解析失败或对账不一致只标记该文件,其余文件照常合并。
+  给了 failures 时解析失败的也记下来,同一会话里重跑不再解析坏文件
+- 给了 history(picklist.history.HistoryStore)时,解析过的文件直接从历史还原,新解析的存进去
+- 上传可以是文件对象:哈希分块读,要解析时才落盘(picklist.spool)按路径解析,不再整份复制成字节;
+  每次解析前向进程的内存预算(MEMORY_BUDGET)预留,超预算时排队
+"""
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from typing import NamedTuple
+
+import pandas as pd
+
+from picklist.cache import PARSE_CACHE, PARSERS, content_hash, parse_key
+from picklist.extract import MAX_WORKERS, available_cpus, get_pool, source_size
+from picklist.incremental import parse_pdf_incremental
+from picklist.perf import merge_perf
+from picklist.parser import RECON_MISMATCH, RECON_OK, RECON_UNKNOWN, ParseResult
+from picklist.skus import get_catalog
+from picklist.spool import MEMORY_BUDGET, hash_stream, spool
+
+
+class WaveFile(NamedTuple):
+    name: str
+    digest: str
+    result: ParseResult = None  # 解析失败或重复文件时为 None
+    error: str = ""
+    duplicate_of: str = ""      # 与之前某个文件内容相同时,记那个文件名
+    parsed: bool = False        # 这次确实解析了(不是从解析缓存或历史还原的)
+
+
+class ParseFailed(Exception):
+    """一份上传解析失败;消息里的落盘临时路径已换成上传的文件名。"""
+
+
+def _parse_in_worker(raw, mode: str) -> ParseResult:
+    # 子进程内整份串行解析(workers=1),不再嵌套进程池;对照表由子进程自己加载。
+    # 页和文字都在子进程里,解析期间的 RSS 也在子进程里采样,随埋点带回
+    with MEMORY_BUDGET.reserve(0) as reservation:
+        result = PARSERS[mode](raw, workers=1)
+    return replace(result, perf=reservation.annotate(result.perf))
+
+
+def merge_results(results) -> ParseResult:
+    sku_counts, b_chain_counts = defaultdict(int), defaultdict(int)
+    totals = defaultdict(int)
+    fields = ("expected_total", "bundle_extra", "mystery_units", "binder_units", "choose_sets_units")
+    results = list(results)
+    for r in results:
+        for k, v in r.sku_counts.items():
+            sku_counts[k] += v
+        for k, v in r.b_chain_counts.items():
+            b_chain_counts[k] += v
+        for f in fields:
+            totals[f] += getattr(r, f)
+    return ParseResult(sku_counts=dict(sku_counts), b_chain_counts=dict(b_chain_counts),
+                       perf=merge_perf(r.perf for r in results), **totals)
+
+
+def parse_wave(files, mode: str = "text", workers: int = None, history=None, failures: dict = None):
+    """
+    files: [(文件名, PDF 字节或二进制文件对象)] → ([WaveFile], 合并后的 ParseResult)。
+    返回的 WaveFile 与输入顺序一致。
+    failures:{解析缓存键: 错误信息},解析失败时写入;传同一个 dict(如 Streamlit 的 session_state)
+    时,记在里面的文件直接按失败返回,不再解析。
+    """
+    catalog = get_catalog()
+    unique, first_name = {}, {}
+    entries, digests = [], []
+    for name, raw in files:
+        digest = content_hash(raw) if isinstance(raw, bytes) else hash_stream(raw)
+        digests.append(digest)
+        if digest in first_name:
+            entries.append(WaveFile(name, digest, duplicate_of=first_name[digest]))
+            continue
+        first_name[digest] = name
+        unique[digest] = raw
+        entries.append(None)
+
+    if workers is None:
+        workers = min(len(unique), available_cpus(), MAX_WORKERS)
+    parse = PARSERS[mode]
+    parsed = set()
+
+    def run(digest):
+        raw = unique[digest]
+
+        def compute():
+            if history is not None:
+                stored = history.lookup(digest, mode, catalog.digest)
+                if stored is not None:
+                    return stored
+            spooled = None if isinstance(raw, bytes) else spool(raw, first_name[digest], digest)
+            source = raw if spooled is None else spooled.path
+            in_worker = mode != "text" and workers > 1
+            try:
+                with MEMORY_BUDGET.reserve(MEMORY_BUDGET.estimate(source_size(source))) as reservation:
+                    if mode == "text":
+                        result = parse_pdf_incremental(source, catalog=catalog)
+                    elif in_worker:
+                        result = get_pool().submit(_parse_in_worker, source, mode).result()
+                    else:
+                        result = parse(source, catalog=catalog)
+            except Exception as e:
+                message = f"{type(e).__name__}: {e}"
+                if spooled is not None:
+                    message = message.replace(spooled.path, first_name[digest])
+                raise ParseFailed(message) from e
+            finally:
+                if spooled is not None:
+                    spooled.close()
+            # 排队时间和同时解析数按本进程的预算记;RSS 在子进程里解析时用子进程带回的
+            result = replace(result, perf=reservation.annotate(result.perf, rss=not in_worker))
+            parsed.add(digest)
+            if history is not None:
+                history.save(digest, first_name[digest], mode, catalog, result)
+            return result
+
+        key = parse_key(digest, mode, catalog)
+        if failures is not None and key in failures:
+            return None, failures[key]
+        try:
+            return PARSE_CACHE.get_or_compute(key, compute), ""
+        except Exception as e:
+            error = str(e) if isinstance(e, ParseFailed) else f"{type(e).__name__}: {e}"
+            if failures is not None:
+                failures[key] = error
+            return None, error
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        futures = {digest: ex.submit(run, digest) for digest in unique}
+        outcomes = {digest: fut.result() for digest, fut in futures.items()}
+
+    for i, ((name, _), digest) in enumerate(zip(files, digests)):
+        if entries[i] is None:
+            result, error = outcomes[digest]
+            entries[i] = WaveFile(name, digest, result, error, parsed=digest in parsed)
+
+    merged = merge_results(e.result for e in entries if e.result is not None)
+    return entries, merged
+
+
+RECON_LABELS = {
+    RECON_OK: "✅ 一致",
+    RECON_MISMATCH: "❌ 对账不一致",
+    RECON_UNKNOWN: "⚠️ 无 Item quantity",
+}
+
+
+def wave_report(entries) -> pd.DataFrame:
+    """每份文件一行的对账表。"""
+    rows = []
+    for e in entries:
+        r = e.result
+        if e.duplicate_of:
+            status = f"⏭️ 与 {e.duplicate_of} 内容相同,未重复计数"
+        elif e.error:
+            status = f"💥 解析失败:{e.error}"
+        else:
+            status = RECON_LABELS[r.reconciliation]
+        rows.append({
+            "文件": e.name,
+            "PDF 标注": r.expected_total if r else None,
+            "bundle 拆分": r.bundle_extra if r else None,
+            "实际提取": r.total_qty if r else None,
+            "差": r.total_qty - r.expected_with_bundle if r and r.expected_total else None,
+            "结果": status,
+        })
+    return pd.DataFrame(rows).astype({c: "Int64" for c in ("PDF 标注", "bundle 拆分", "实际提取", "差")})
+
+
+def upload_memory_report(entries) -> pd.DataFrame:
+    """
+    每份解析过的文件一行:大小、在内存预算上排队的时间、同时解析数、解析前后的 RSS
+    (从历史还原的为空;交给进程池解析的是子进程的 RSS)。
+    """
+    rows = []
+    for e in entries:
+        if e.result is None:
+            continue
+        c = e.result.perf.get("counts", {})
+        rows.append({
+            "文件": e.name,
+            "大小 KB": round(c["bytes"] / 1024) if "bytes" in c else None,
+            "排队 ms": c.get("memory_wait_ms"),
+            "同时解析": c.get("concurrent_parses"),
+            "解析前 RSS MB": round(c["rss_start_kb"] / 1024, 1) if c.get("rss_start_kb") else None,
+            "峰值 RSS MB": round(c["rss_peak_kb"] / 1024, 1) if c.get("rss_peak_kb") else None,
+        })
+    columns = ["文件", "大小 KB", "排队 ms", "同时解析", "解析前 RSS MB", "峰值 RSS MB"]
+    return pd.DataFrame(rows, columns=columns).astype({c: "Int64" for c in ("大小 KB", "排队 ms", "同时解析")})
+
+
+def failed_files(entries) -> list:
+    """对账不一致或解析失败的文件名(重复文件和缺少 Item quantity 的不算)。"""
+    return [e.name for e in entries
+            if e.error or (e.result is not None and e.result.reconciliation == RECON_MISMATCH)]